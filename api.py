@@ -0,0 +1,120 @@
+"""
+API קריאה בלבד (JSON, גרסה 1) עבור נגן מבחנים בצד הלקוח.
+כל תשובה נושאת ETag חזק שנגזר מגרסת המאגר ומה-URL, כך שבקשה חוזרת עם
+If-None-Match מקבלת 304 בלי לגשת לשאלות עצמן.
+התשובות הנכונות לא נחשפות כאן - הבדיקה נשארת ב-/check_answer.
+"""
+import hashlib
+
+from flask import Blueprint, Response, abort, jsonify, request, url_for
+
+import data_manager
+from question_store import get_bank_cache, get_compiled, fetch_question, fetch_questions
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+MAX_BATCH = 100
+
+def _etag(version):
+    digest = hashlib.sha1(request.full_path.encode('utf-8')).hexdigest()[:16]
+    return f"{version}-{digest}"
+
+def _cached_response(build):
+    """מחזיר 304 אם ה-ETag של הלקוח עדכני; אחרת בונה את התשובה"""
+    conn = data_manager.get_db_connection(readonly=True)
+    try:
+        cache = get_bank_cache(conn)
+        etag = _etag(cache['version'])
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = jsonify(build(conn, cache))
+    finally:
+        conn.close()
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, no-cache'
+    return response
+
+def _question_json(cache, row):
+    compiled = get_compiled(cache, row)
+    _, pos, prev_id, next_id, total = cache['positions'].get(row['id']) or (row['sub_topic'], 0, None, None, 1)
+    return {
+        'id': row['id'],
+        'topic': row['topic'],
+        'sub_topic': row['sub_topic'],
+        'question_text': row['question_text'],
+        'options': list(compiled.options),
+        'is_multi': compiled.is_multi,
+        'image_url': url_for('serve_image', filename=row['image_path']) if row['image_path'] else None,
+        'position': pos + 1,
+        'total': total,
+        'prev_id': prev_id,
+        'next_id': next_id,
+    }
+
+def _page_args():
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', DEFAULT_PER_PAGE, type=int), 1), MAX_PER_PAGE)
+    return page, per_page
+
+# ----------------------------------------------------------------------
+# 📚 נושאים
+# ----------------------------------------------------------------------
+@api.route('/topics')
+def topics():
+    def build(conn, cache):
+        result = []
+        for topic, data in cache['nav_light'].items():
+            subs = [{'name': sub, 'count': len(qs)} for sub, qs in data['sub_topics'].items()]
+            result.append({'topic': topic, 'count': sum(s['count'] for s in subs), 'sub_topics': subs})
+        return {'version': cache['version'], 'topics': result}
+    return _cached_response(build)
+
+@api.route('/sub_topics/<path:sub_topic>/questions')
+def sub_topic_questions(sub_topic):
+    page, per_page = _page_args()
+
+    def build(conn, cache):
+        ids = cache['sub_topic_ids'].get(sub_topic)
+        if ids is None:
+            abort(404)
+        page_ids = ids[(page - 1) * per_page:page * per_page]
+        rows = fetch_questions(conn, page_ids, cache)
+        return {
+            'sub_topic': sub_topic,
+            'page': page,
+            'per_page': per_page,
+            'total': len(ids),
+            'questions': [_question_json(cache, rows[i]) for i in page_ids if i in rows],
+        }
+    return _cached_response(build)
+
+# ----------------------------------------------------------------------
+# ❓ שאלות
+# ----------------------------------------------------------------------
+@api.route('/questions/<int:question_id>')
+def question(question_id):
+    def build(conn, cache):
+        row = fetch_question(conn, question_id, cache)
+        if not row:
+            abort(404)
+        return _question_json(cache, row)
+    return _cached_response(build)
+
+@api.route('/questions')
+def questions_batch():
+    """?ids=1,2,3 - עד MAX_BATCH שאלות בבקשה אחת (לטעינה מוקדמת של השאלות הבאות)"""
+    try:
+        ids = [int(x) for x in request.args.get('ids', '').split(',') if x.strip()]
+    except ValueError:
+        abort(400)
+    if len(ids) > MAX_BATCH:
+        abort(400)
+
+    def build(conn, cache):
+        rows = fetch_questions(conn, ids, cache)
+        return {'questions': [_question_json(cache, rows[i]) for i in ids if i in rows],
+                'missing': [i for i in ids if i not in rows]}
+    return _cached_response(build)
@@ -1,65 +1,112 @@
 from flask import Flask, render_template, request, jsonify, redirect, url_for, session, send_from_directory
-import sqlite3
 import random
+import secrets
 import os
-import re
-import html
 import glob
-import json
+import time
+import threading
 from urllib.parse import unquote
+from werkzeug.exceptions import NotFound
+from werkzeug.utils import safe_join
+from markupsafe import Markup
 import data_manager
+import exam_store
+import attempt_log
+import question_stats
+import bank_writer
+import metrics
+import compression
+from api import api
+from question_store import (get_bank_cache, get_compiled, fetch_question, fetch_questions, sample_exam, option_orders,
+                            freeze_shared, MEMORY_STORE)
+
+try:
+    from PIL import Image
+except ImportError:  # בלי Pillow מוגשות רק התמונות המקוריות
+    Image = None
 
 app = Flask(__name__)
 app.secret_key = 'quiz_secret_key_123' 
+metrics.init_app(app)
+compression.init_app(app)
+app.register_blueprint(api)
 
-DB_FILE = 'quiz_db.sqlite'
-QUESTIONS_PATTERN = '*.json' 
+DB_FILE = data_manager.DB_FILE
+QUESTIONS_PATTERNS = ('*.json', '*.ndjson', '*.jsonl')
 
 # ----------------------------------------------------------------------
 # 🖼️ תמונות
 # ----------------------------------------------------------------------
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'images')
+IMAGE_CACHE_DIR = os.path.join(IMAGES_DIR, '.cache')
+IMAGE_MAX_AGE = 7 * 24 * 60 * 60
+# גרסאות מוקטנות (רוחב/גובה מקסימלי בפיקסלים), נבחרות עם ?size=
+IMAGE_VARIANTS = {'thumb': 240, 'medium': 900}
+
+def _image_variant(name, size):
+    """מחזיר (תיקייה, שם קובץ) של גרסה מוקטנת; נבנית פעם אחת לדיסק"""
+    src = safe_join(IMAGES_DIR, name)
+    if Image is None or size not in IMAGE_VARIANTS or not src or not os.path.isfile(src):
+        return IMAGES_DIR, name
+
+    out_dir = os.path.join(IMAGE_CACHE_DIR, size)
+    out = safe_join(out_dir, name)
+    if not os.path.exists(out) or os.path.getmtime(out) < os.path.getmtime(src):
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        # שם ייחודי לכל thread - שתי בקשות באותו worker לא כותבות לאותו קובץ זמני
+        tmp = f"{out}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with Image.open(src) as img:
+                img.thumbnail((IMAGE_VARIANTS[size], IMAGE_VARIANTS[size]))
+                img.save(tmp, format=img.format or 'PNG', optimize=True)
+            os.replace(tmp, out)  # אטומי - workers מקבילים לא יראו קובץ חלקי
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            # קובץ ש-Pillow לא מזהה או לא מצליח להקטין מוגש כמו שהוא
+            print(f"⚠️ לא ניתן להקטין את {name}: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return IMAGES_DIR, name
+    return out_dir, name
+
 @app.route('/custom_img/<path:filename>')
 def serve_image(filename):
     decoded = unquote(filename)
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    path = os.path.join(base_dir, 'static', 'images', decoded)
-    if os.path.exists(path):
-        return send_from_directory(os.path.dirname(path), os.path.basename(path))
-    return "Image not found", 404
+    try:
+        directory, name = _image_variant(decoded, request.args.get('size'))
+        # ETag / Last-Modified ו-304 מטופלים ע"י send_from_directory
+        return send_from_directory(directory, name, max_age=IMAGE_MAX_AGE, conditional=True)
+    except NotFound:
+        return "Image not found", 404
 
 # ----------------------------------------------------------------------
 # 🔧 עזרים
 # ----------------------------------------------------------------------
-def get_db_connection():
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+def get_db_connection(readonly=True):
+    # הנתיבים כאן רק קוראים; כתיבה עוברת דרך data_manager.
+    # החיבור משותף לכל ה-thread, ו-close() רק משחרר טרנזקציה פתוחה
+    return data_manager.get_db_connection(readonly=readonly)
 
-def clean_text_for_comparison(text):
-    if not text: return ""
-    return re.sub(r'[^a-z0-9א-ת]', '', html.unescape(str(text)).lower())
+@app.teardown_request
+def release_db(exc):
+    data_manager.release_db_connections()
 
-def get_navigation_data():
+def cached_fragment(cache, key, template, **context):
+    """
+    קטע HTML שלא תלוי במשתמש או בבקשה, מרונדר פעם אחת לכל גרסת מאגר.
+    כל מה שמשתנה בין בקשות (ערבוב תשובות, סימון השאלה הנוכחית) נשאר מחוץ לקטע.
+    """
+    html = cache['fragments'].get(key)
+    if html is None:
+        html = cache['fragments'][key] = Markup(render_template(template, **context))
+    return html
+
+@app.route('/question_preview/<int:question_id>')
+def question_preview(question_id):
     conn = get_db_connection()
-    try: 
-        q_list = conn.execute('SELECT id, question_text, topic, sub_topic FROM Questions ORDER BY topic, sub_topic, id').fetchall()
-    except: 
-        return {}
-    finally:
-        conn.close()
-    
-    tree = {}
-    counters = {}
-    
-    for q in q_list:
-        t, st = q['topic'], q['sub_topic']
-        if t not in tree: tree[t] = {'sub_topics': {}}
-        if st not in tree[t]['sub_topics']: 
-            tree[t]['sub_topics'][st] = []
-            counters[(t, st)] = 0
-        counters[(t, st)] += 1
-        tree[t]['sub_topics'][st].append({'id': q['id'], 'number': counters[(t, st)], 'text': q['question_text']})
-    return tree
+    q = fetch_question(conn, question_id)
+    conn.close()
+    if not q: return jsonify({"error": "Error"}), 404
+    return jsonify({"text": q['question_text']})
 
 # ----------------------------------------------------------------------
 # ✏️ עריכה
@@ -67,6 +114,8 @@ def get_navigation_data():
 @app.route('/edit_question/<int:question_id>', methods=['GET', 'POST'])
 def edit_question(question_id):
     conn = get_db_connection()
+    # התמונה לפני השורה - כך שורה שנקראה לא נשמרת בגרסה חדשה ממנה
+    cache = get_bank_cache(conn)
     q_row = conn.execute('SELECT * FROM Questions WHERE id = ?', (question_id,)).fetchone()
     conn.close()
     
@@ -86,34 +135,14 @@ def edit_question(question_id):
             'image_path': request.form['image_path']
         }
         
-        conn = get_db_connection()
-        conn.execute('''
-            UPDATE Questions SET 
-            question_text=?, correct_answer=?, distractor_1=?, distractor_2=?, 
-            distractor_3=?, explanation=?, topic=?, sub_topic=?, image_path=?
-            WHERE id=?
-        ''', (*new_data.values(), question_id))
-        conn.commit()
-        conn.close()
+        data_manager.update_question(question_id, new_data)
         
-        data_manager.update_json_file(q['source_file'], q['question_text'], new_data)
+        bank_writer.update_json_file(q['source_file'], q['uid'], new_data)
         return redirect(url_for('get_question', question_id=question_id, edited='true'))
 
-    options, indices = [], []
-    try:
-        parsed = json.loads(q['correct_answer'])
-        if isinstance(parsed, list):
-            options.extend(parsed)
-            indices = list(range(len(parsed)))
-        else:
-            options.append(str(parsed))
-            indices = [0]
-    except:
-        options.append(q['correct_answer'])
-        indices = [0]
-
-    for d in ['distractor_1', 'distractor_2', 'distractor_3']:
-        if q[d]: options.append(q[d])
+    compiled = get_compiled(cache, q_row)
+    options = list(compiled.options)
+    indices = list(range(len(compiled.correct_answers)))
     
     while len(options) < 4: options.append("")
     return render_template('edit_question.html', q=q, options=options, correct_indices=indices)
@@ -125,16 +154,13 @@ def edit_question(question_id):
 def delete_question(question_id):
     conn = get_db_connection()
     q = conn.execute('SELECT * FROM Questions WHERE id = ?', (question_id,)).fetchone()
+    conn.close()
     
     if not q:
-        conn.close()
         return "לא נמצא", 404
         
-    data_manager.delete_question_from_file(q['source_file'], q['question_text'])
-    
-    conn.execute('DELETE FROM Questions WHERE id = ?', (question_id,))
-    conn.commit()
-    conn.close()
+    bank_writer.delete_question_from_file(q['source_file'], q['uid'])
+    data_manager.delete_question(question_id)
     
     return redirect(url_for('index'))
 
@@ -144,40 +170,29 @@ def delete_question(question_id):
 @app.route('/check_answer', methods=['POST'])
 def check_answer():
     user_picks = request.form.getlist('selected_answer')
-    q_id = request.form.get('question_id')
+    q_id = request.form.get('question_id', type=int)
     
     conn = get_db_connection()
-    q = conn.execute('SELECT correct_answer, explanation FROM Questions WHERE id=?', (q_id,)).fetchone()
+    cache = get_bank_cache(conn)
+    q = fetch_question(conn, q_id, cache)
+    compiled = get_compiled(cache, q) if q else None
     conn.close()
     
     if not q: return jsonify({"error": "Error"}), 404
 
-    try: 
-        correct_list = json.loads(q['correct_answer'])
-        if not isinstance(correct_list, list): correct_list = [str(correct_list)]
-    except: 
-        correct_list = [q['correct_answer']]
-
-    u_clean = {clean_text_for_comparison(x) for x in user_picks}
-    c_clean = {clean_text_for_comparison(x) for x in correct_list}
-    
-    is_correct = (u_clean == c_clean) and (len(u_clean) > 0)
-    is_partial = (len(u_clean.intersection(c_clean)) > 0) and not is_correct
-    
-    status = "wrong"
+    status, missing = compiled.grade(user_picks)
+    attempt_log.record(q['id'], q['uid'], status, user_picks,
+                       latency_ms=request.form.get('latency_ms', type=int))
     msg = "❌ שגוי."
     
-    if is_correct:
-        status = "correct"
+    if status == "correct":
         msg = "✅ נכון!"
-    elif is_partial:
-        status = "partial"
-        missing = len(c_clean) - len(u_clean.intersection(c_clean))
+    elif status == "partial":
         msg = f"⚠️ תשובה חלקית (חסרות {missing})."
     
     return jsonify({
         "status": status, 
-        "correct_answers": correct_list, 
+        "correct_answers": list(compiled.correct_answers), 
         "message": msg, 
         "explanation": q['explanation']
     })
@@ -210,33 +225,47 @@ def start_quiz():
 @app.route('/question/<int:question_id>')
 def get_question(question_id):
     conn = get_db_connection()
-    q = conn.execute('SELECT * FROM Questions WHERE id=?', (question_id,)).fetchone()
-    if not q: return "השאלה לא נמצאה (אולי נמחקה או DB לא אותחל)", 404
-    
-    sub = q['sub_topic']
-    all_qs = conn.execute('SELECT id FROM Questions WHERE sub_topic=? ORDER BY id', (sub,)).fetchall()
-    ids = [row['id'] for row in all_qs]
+    cache = get_bank_cache(conn)
+    q = fetch_question(conn, question_id, cache)
     conn.close()
+    if not q: return "השאלה לא נמצאה (אולי נמחקה או DB לא אותחל)", 404
+
+    compiled = get_compiled(cache, q)
+    _, idx, prev_id, next_id, total = cache['positions'].get(question_id) or (q['sub_topic'], 0, None, None, 1)
     
-    idx = ids.index(question_id) if question_id in ids else 0
-    next_id = ids[idx+1] if idx+1 < len(ids) else None
-    prev_id = ids[idx-1] if idx > 0 else None
-    
-    opts = []
-    try: 
-        parsed = json.loads(q['correct_answer'])
-        opts.extend(parsed if isinstance(parsed, list) else [str(parsed)])
-    except: 
-        opts.append(q['correct_answer'])
-    
-    for d in ['distractor_1', 'distractor_2', 'distractor_3']:
-        if q[d]: opts.append(q[d])
+    opts = list(compiled.options)
     random.shuffle(opts)
     
-    return render_template('question.html', question=q, options=opts, 
-                           next_id=next_id, prev_id=prev_id,
-                           navigation_data=get_navigation_data(),
-                           current_q_in_category=idx+1, total_q_in_category=len(ids))
+    sidebar = cached_fragment(cache, 'sidebar', 'question_sidebar.html', navigation_data=cache['nav_light'])
+    body = cached_fragment(cache, ('question_body', question_id), 'question_body.html',
+                           question=q, is_multi=compiled.is_multi)
+    return render_template('question.html', question=q, options=opts, is_multi=compiled.is_multi,
+                           next_id=next_id, prev_id=prev_id, sidebar=sidebar, question_body=body,
+                           current_q_in_category=idx+1, total_q_in_category=total)
+
+# ----------------------------------------------------------------------
+# 🔎 חיפוש
+# ----------------------------------------------------------------------
+SEARCH_PER_PAGE = 20
+
+def _search_args():
+    q = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', SEARCH_PER_PAGE, type=int), 1), 100)
+    return q, page, per_page
+
+@app.route('/api/search')
+def api_search():
+    q, page, per_page = _search_args()
+    results, total = data_manager.search_questions(q, page, per_page)
+    return jsonify({"query": q, "page": page, "per_page": per_page, "total": total, "results": results})
+
+@app.route('/search')
+def search():
+    q, page, per_page = _search_args()
+    results, total = data_manager.search_questions(q, page, per_page)
+    pages = (total + per_page - 1) // per_page
+    return render_template('search.html', query=q, results=results, total=total, page=page, pages=pages)
 
 # ----------------------------------------------------------------------
 # 🎓 בחינה
@@ -245,37 +274,70 @@ def get_question(question_id):
 def exam_setup():
     conn = get_db_connection()
     data = conn.execute('SELECT DISTINCT topic, sub_topic FROM Questions').fetchall()
+    sizes = {s: len(ids) for s, ids in get_bank_cache(conn)['sub_topic_ids'].items()}
     conn.close()
     topics = {}
     for r in data:
         if r['topic'] not in topics: topics[r['topic']] = []
         if r['sub_topic'] not in topics[r['topic']]: topics[r['topic']].append(r['sub_topic'])
-    return render_template('exam_setup.html', topics=topics)
+    return render_template('exam_setup.html', topics=topics, sizes=sizes)
+
+# כמה בחינות אחרונות נזכרות ב-session לצורך "בלי שאלות שכבר ראיתי"
+EXAM_HISTORY_SIZE = 10
+
+def _begin_exam(label, ids, seed=None):
+    # ב-cookie נשמר רק מזהה הבחינה; הרשימה, סדר האפשרויות והתשובות נשמרים בשרת
+    session.pop('exam_ids', None)
+    session.pop('exam_answers', None)
+    conn = get_db_connection()
+    cache = get_bank_cache(conn)
+    orders = option_orders(cache, fetch_questions(conn, ids, cache), seed or secrets.token_hex(8))
+    conn.close()
+    exam_id = exam_store.create_exam(label, ids, orders)
+    session['exam_id'] = exam_id
+    session['exam_history'] = (session.get('exam_history', []) + [exam_id])[-EXAM_HISTORY_SIZE:]
+    return redirect(url_for('exam_question', index=0))
 
 @app.route('/start_exam', methods=['POST'])
 def start_exam():
+    if request.form.get('mode') == 'random':
+        return start_random_exam()
+
     sub = request.form.get('sub_topic')
     conn = get_db_connection()
-    ids = [r['id'] for r in conn.execute('SELECT id FROM Questions WHERE sub_topic=? ORDER BY id', (sub,)).fetchall()]
+    ids = list(get_bank_cache(conn)['sub_topic_ids'].get(sub, []))
     conn.close()
     if not ids: return "ריק", 404
-    session['exam_ids'] = ids
-    session['exam_answers'] = {}
-    session['exam_sub_topic'] = sub
-    return redirect(url_for('exam_question', index=0))
+    return _begin_exam(sub, ids)
+
+def start_random_exam():
+    """מבחן של N שאלות שנדגמות מכמה תתי-נושאים, עם מכסות, seed ואפשרות לדלג על שאלות שנראו"""
+    subs = request.form.getlist('sub_topics')
+    count = max(request.form.get('count', 0, type=int), 0)
+    quotas = {s: max(request.form.get(f'quota_{s}', 0, type=int), 0) for s in subs}
+    seed = request.form.get('seed', '').strip() or str(random.randrange(10**6))
+
+    exclude = frozenset()
+    if request.form.get('exclude_seen'):
+        exclude = frozenset(exam_store.get_seen_question_ids(session.get('exam_history', [])))
+
+    conn = get_db_connection()
+    cache = get_bank_cache(conn)
+    conn.close()
+    ids = sample_exam(cache, subs, count, quotas, random.Random(seed), exclude)
+    if not ids: return "ריק", 404
+    return _begin_exam(f"מבחן אקראי ({len(ids)} שאלות, seed {seed})", ids, seed)
 
 @app.route('/exam/<int:index>', methods=['GET', 'POST'])
 def exam_question(index):
-    ids = session.get('exam_ids', [])
+    exam = exam_store.get_exam(session.get('exam_id'))
+    ids = exam['ids'] if exam else []
     if not ids or index >= len(ids): return redirect(url_for('exam_setup'))
     
     if request.method == 'POST':
         sel = request.form.getlist('selected_answer')
         if sel:
-            ans = session.get('exam_answers', {})
-            ans[str(ids[index])] = sel if len(sel) > 1 else sel[0]
-            session['exam_answers'] = ans
-            session.modified = True
+            exam_store.save_answer(session['exam_id'], ids[index], sel if len(sel) > 1 else sel[0])
         
         act = request.form.get('action')
         if act == 'next': return redirect(url_for('exam_question', index=index+1))
@@ -284,79 +346,201 @@ def exam_question(index):
         elif act and 'jump_' in act: return redirect(url_for('exam_question', index=int(act.split('_')[1])))
 
     conn = get_db_connection()
-    q = conn.execute('SELECT * FROM Questions WHERE id=?', (ids[index],)).fetchone()
+    cache = get_bank_cache(conn)
+    q = fetch_question(conn, ids[index], cache)
+    if not q:
+        conn.close()
+        return "השאלה לא נמצאה (אולי נמחקה)", 404
+    compiled = get_compiled(cache, q)
     conn.close()
     
-    opts = []
-    try: 
-        parsed = json.loads(q['correct_answer'])
-        opts.extend(parsed if isinstance(parsed, list) else [str(parsed)])
-    except: opts.append(q['correct_answer'])
-    for d in ['distractor_1', 'distractor_2', 'distractor_3']:
-        if q[d]: opts.append(q[d])
-    random.shuffle(opts)
+    opts = compiled.shuffled(exam['option_orders'].get(str(ids[index])))
     
-    user_sel = session.get('exam_answers', {}).get(str(ids[index]))
+    answers = exam['answers']
+    user_sel = answers.get(str(ids[index]))
     if user_sel and not isinstance(user_sel, list): user_sel = [user_sel]
     
-    nav = [{'index': i, 'number': i+1, 'status': 'answered' if str(uid) in session.get('exam_answers',{}) else 'default'} for i, uid in enumerate(ids)]
+    nav = [{'index': i, 'number': i+1, 'status': 'answered' if str(uid) in answers else 'default'} for i, uid in enumerate(ids)]
     nav[index]['status'] = 'active'
     
-    return render_template('exam_question.html', question=q, options=opts, index=index, total=len(ids), user_selection=user_sel or [], exam_nav=nav, sub_topic=session.get('exam_sub_topic'))
+    return render_template('exam_question.html', question=q, options=opts, is_multi=compiled.is_multi, index=index, total=len(ids), user_selection=user_sel or [], exam_nav=nav, sub_topic=exam['sub_topic'])
 
 @app.route('/submit_exam')
 def submit_exam():
-    ids = session.get('exam_ids', [])
-    ans = session.get('exam_answers', {})
-    if not ids: return redirect(url_for('exam_setup'))
+    exam = exam_store.get_exam(session.get('exam_id'))
+    if not exam: return redirect(url_for('exam_setup'))
+    ids, ans = exam['ids'], exam['answers']
     
     score, results = 0, []
     conn = get_db_connection()
+    cache = get_bank_cache(conn)
+    rows = fetch_questions(conn, ids, cache)
+    conn.close()
+    stats = question_stats.get_question_stats([(qid, rows[qid]['uid']) for qid in ids if qid in rows])
     for qid in ids:
-        q = conn.execute('SELECT * FROM Questions WHERE id=?', (qid,)).fetchone()
+        q = rows.get(qid)
+        if q is None: continue  # נמחקה במהלך המבחן
         
         u_raw = ans.get(str(qid))
         u_list = u_raw if isinstance(u_raw, list) else ([u_raw] if u_raw else [])
-        u_clean = {clean_text_for_comparison(x) for x in u_list}
-        
-        try: c_list = json.loads(q['correct_answer'])
-        except: c_list = [q['correct_answer']]
-        if not isinstance(c_list, list): c_list = [str(c_list)]
-        c_clean = {clean_text_for_comparison(x) for x in c_list}
+        compiled = get_compiled(cache, q)
+        status, _ = compiled.grade(u_list)
+        attempt_log.record(qid, q['uid'], status, u_list, exam_id=session['exam_id'])
         
-        is_corr = (u_clean == c_clean) and len(u_clean) > 0
+        is_corr = status == "correct"
         if is_corr: score += 1
         
         results.append({
             'question': q,
             'user_answer': ", ".join(u_list),
-            'correct_answer': ", ".join(c_list),
+            'correct_answer': ", ".join(compiled.correct_answers),
             'is_correct': is_corr,
-            'is_partial': len(u_clean.intersection(c_clean)) > 0 and not is_corr,
-            'explanation': q['explanation']
+            'is_partial': status == "partial",
+            'explanation': q['explanation'],
+            'stats': stats.get(qid),
+            'top_distractor': question_stats.top_distractor(stats.get(qid), compiled)
         })
+    # שאלות שנמחקו במהלך המבחן לא נספרות במכנה
+    return render_template('exam_result.html', score=int((score/len(results))*100) if results else 0, results=results, total=len(results), correct_count=score)
+
+# ----------------------------------------------------------------------
+# 📊 סטטיסטיקות
+# ----------------------------------------------------------------------
+STATS_TOP_N = 25
+
+@app.route('/admin/stats')
+def admin_stats():
+    """
+    אחוזי הצלחה לפי תת-נושא, לפי קובץ מקור ולפי שאלה. נקרא מטבלת הסיכום (שורה לשאלה),
+    כך שהעלות תלויה בגודל המאגר ולא במספר הניסיונות.
+    """
+    summary = {s['uid']: s for s in question_stats.get_summary()}
+    conn = get_db_connection()
+    rows = conn.execute('SELECT id, uid, question_text, sub_topic, source_file FROM Questions').fetchall()
+
+    groups = {'sub_topic': {}, 'source_file': {}}
+    questions = []
+    for r in rows:
+        s = summary.get(r['uid']) or summary.get(f"id:{r['id']}")
+        if not s: continue
+        for field, agg in groups.items():
+            g = agg.setdefault(r[field], {'name': r[field], 'attempts': 0, 'correct': 0, 'questions': 0})
+            g['attempts'] += s['attempts']
+            g['correct'] += s['correct']
+            g['questions'] += 1
+        if s['attempts'] >= question_stats.MIN_ATTEMPTS:
+            questions.append({'id': r['id'], 'text': r['question_text'], 'sub_topic': r['sub_topic'],
+                              'attempts': s['attempts'], 'percent_correct': round(100 * s['correct'] / s['attempts'])})
+
+    def ranked(agg):
+        out = sorted(agg.values(), key=lambda g: g['correct'] / g['attempts'] if g['attempts'] else 1)
+        for g in out:
+            g['percent_correct'] = round(100 * g['correct'] / g['attempts']) if g['attempts'] else None
+        return out
+
+    hardest = sorted(questions, key=lambda q: (q['percent_correct'], -q['attempts']))[:STATS_TOP_N]
+    cache = get_bank_cache(conn)
+    full = fetch_questions(conn, [q['id'] for q in hardest], cache)
     conn.close()
-    return render_template('exam_result.html', score=int((score/len(ids))*100) if ids else 0, results=results, total=len(ids), correct_count=score)
+    per_q = question_stats.get_question_stats([(qid, full[qid]['uid']) for qid in full])
+    for q in hardest:
+        if q['id'] in full:
+            q['top_distractor'] = question_stats.top_distractor(per_q.get(q['id']), get_compiled(cache, full[q['id']]))
+
+    return render_template('admin_stats.html', by_sub_topic=ranked(groups['sub_topic']),
+                           by_source=ranked(groups['source_file']), hardest=hardest,
+                           total_attempts=sum(s['attempts'] for s in summary.values()),
+                           min_attempts=question_stats.MIN_ATTEMPTS)
 
 # ----------------------------------------------------------------------
 # 🚀 אתחול - התיקון החשוב: קריאה מחוץ ל-main
 # ----------------------------------------------------------------------
+def bank_files():
+    return sorted(f for pattern in QUESTIONS_PATTERNS for f in glob.glob(pattern))
+
 def setup_database():
     try:
-        data_manager.rebuild_database()
-        files = glob.glob(QUESTIONS_PATTERN)
-        if files:
-            for f in files:
-                data_manager.load_questions_from_file(f)
-            print(f"✅ DB אותחל. נטענו {len(files)} קבצים.")
-        else:
+        exam_store.init_store()
+        attempt_log.init_log()
+        question_stats.init_stats()
+        files = bank_files()
+        if not files:
             print("⚠️ לא נמצאו קבצי JSON!")
+        stats = data_manager.build_database(files)
+        print(f"✅ DB מוכן. נטענו {len(stats['loaded'])} קבצים, "
+              f"{len(stats['skipped'])} ללא שינוי, {len(stats['removed'])} הוסרו.")
     except Exception as e:
         print(f"❌ שגיאה באתחול: {e}")
 
+# ----------------------------------------------------------------------
+# 👀 טעינה חמה של קבצי JSON
+# ----------------------------------------------------------------------
+# כל כמה שניות לבדוק אם קבצי המאגר נוספו / השתנו / הוסרו (0 = כבוי)
+WATCH_INTERVAL = float(os.environ.get('QUIZ_WATCH_INTERVAL', '5'))
+
+def _scan_banks():
+    snapshot = {}
+    for f in bank_files():
+        try:
+            st = os.stat(f)
+        except FileNotFoundError:
+            continue
+        snapshot[f] = (st.st_mtime_ns, st.st_size)
+    return snapshot
+
+def watch_banks(interval):
+    """
+    לולאת רקע: כשמשהו משתנה מריצים את הבנייה האינקרמנטלית, שמסנכרנת רק את הקובץ
+    שהשתנה בטרנזקציה משלו ומעלה את גרסת המאגר - כך כל המטמונים בכל ה-workers נפסלים.
+    הסבב הראשון תמיד בונה: ה-watcher מתחיל בבקשה הראשונה, ושינוי שקרה מאז הבנייה בעלייה
+    (בתהליך הראשי של --preload) היה נבלע אחרת. המניפסט מדלג על כל מה שלא השתנה.
+    """
+    snapshot = None
+    while True:
+        time.sleep(interval)
+        current = _scan_banks()
+        if current == snapshot:
+            continue
+        try:
+            stats = data_manager.build_database(list(current))
+            if stats['loaded'] or stats['removed']:
+                print(f"🔄 מאגר עודכן: {len(stats['loaded'])} קבצים נטענו, {len(stats['removed'])} הוסרו.")
+            # קובץ שנכשל (למשל באמצע כתיבה) ייטען כשהכתיבה תסתיים וה-mtime ישתנה
+            snapshot = current
+        except Exception as e:
+            print(f"❌ שגיאה בטעינה חמה: {e}")
+
+@app.before_request
+def start_bank_watcher():
+    """
+    ה-thread נוצר בבקשה הראשונה של כל תהליך ולא בטעינת המודול: עם gunicorn --preload
+    thread שנוצר בתהליך הראשי לא עובר ל-workers, ו-fork באמצע בנייה היה יורש נעילות תפוסות.
+    """
+    if WATCH_INTERVAL > 0:
+        data_manager.start_per_process_thread('bank-watcher', watch_banks, WATCH_INTERVAL)
+
+def warm_bank_cache():
+    """
+    בונה את מטמון המאגר (ואת המאגר בזיכרון, אם הופעל) כבר בעלייה. עם gunicorn --preload
+    זה קורה בתהליך הראשי, וה-workers מקבלים את המבנים מוכנים ומשותפים דרך fork.
+    """
+    conn = get_db_connection()
+    try:
+        get_bank_cache(conn)
+    except Exception as e:
+        print(f"❌ שגיאה בטעינת המטמון: {e}")
+        return
+    finally:
+        conn.close()
+        # חיבורי SQLite פתוחים לא עוברים fork בבטחה - כל worker פותח את שלו
+        data_manager.dispose_db_connections()
+    if MEMORY_STORE:
+        freeze_shared()
+
 # קריאה לאתחול מיד עם טעינת המודול, כך שזה ירוץ גם ב-flask run
 with app.app_context():
     setup_database()
+    warm_bank_cache()
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,178 @@
+"""
+יומן ניסיונות: כל בדיקת תשובה (תרגול) וכל שאלה במבחן שהוגש נרשמות ב-quiz_state.sqlite.
+הכתיבה עוברת דרך תור בזיכרון ו-thread רקע שכותב במנות בטרנזקציה אחת, כך שנתיב הבדיקה
+לא מחכה ל-fsync. שורות גולמיות ישנות מ-RETENTION_DAYS מגולגלות לסיכום יומי ונמחקות.
+"""
+import atexit
+import json
+import os
+import queue
+import time
+
+import data_manager
+import exam_store
+import question_stats
+
+# כמה ניסיונות לכל היותר בכתיבה אחת, וכמה זמן לחכות לפני כתיבת מנה חלקית
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 2.0
+# מעבר לזה התור מלא ורשומות חדשות נזרקות (הבדיקה עצמה לא נפגעת)
+MAX_QUEUE = 50000
+
+# שורות גולמיות נשמרות כמה ימים, ואחר כך נשאר רק הסיכום היומי
+RETENTION_DAYS = int(os.environ.get('QUIZ_ATTEMPT_RETENTION_DAYS', '30'))
+COMPACT_INTERVAL = 60 * 60
+
+_queue = queue.Queue(maxsize=MAX_QUEUE)
+_dropped = 0
+
+def create_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS Attempts (
+            id INTEGER PRIMARY KEY,
+            ts REAL NOT NULL,
+            question_id INTEGER NOT NULL,
+            uid TEXT,
+            exam_id TEXT,
+            status TEXT NOT NULL,
+            selected TEXT NOT NULL,
+            latency_ms INTEGER
+        );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_attempts_ts ON Attempts (ts);")
+    # הגשה חוזרת של אותו מבחן (רענון עמוד התוצאות) לא נרשמת פעמיים
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_attempts_exam ON Attempts (exam_id, question_id) WHERE exam_id IS NOT NULL;")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS AttemptsDaily (
+            day TEXT NOT NULL,
+            uid TEXT NOT NULL,
+            question_id INTEGER,
+            attempts INTEGER NOT NULL,
+            correct INTEGER NOT NULL,
+            partial INTEGER NOT NULL,
+            wrong INTEGER NOT NULL,
+            latency_ms_total INTEGER NOT NULL,
+            latency_count INTEGER NOT NULL,
+            PRIMARY KEY (day, uid)
+        );
+    """)
+
+def init_log():
+    conn = exam_store.get_state_connection()
+    try:
+        with conn:
+            create_tables(conn)
+    finally:
+        conn.close()
+
+# ----------------------------------------------------------------------
+# ✍️ רישום
+# ----------------------------------------------------------------------
+def record(question_id, uid, status, selected, latency_ms=None, exam_id=None):
+    """מכניס ניסיון לתור וחוזר מיד"""
+    global _dropped
+    _ensure_writer()
+    try:
+        _queue.put_nowait((time.time(), question_id, uid, exam_id, status,
+                           json.dumps(list(selected), ensure_ascii=False), latency_ms))
+    except queue.Full:
+        _dropped += 1
+
+INSERT_SQL = """
+    INSERT OR IGNORE INTO Attempts (ts, question_id, uid, exam_id, status, selected, latency_ms)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+def _write_batch(batch):
+    """כותב את המנה ומעדכן את סיכומי השאלות באותה טרנזקציה"""
+    conn = exam_store.get_state_connection()
+    try:
+        with conn:
+            inserted = []
+            for row in batch:
+                # שורה שנדחתה (מבחן שכבר נרשם) לא נספרת בסיכומים
+                if conn.execute(INSERT_SQL, row).rowcount:
+                    inserted.append((row[1], row[2], row[4], json.loads(row[5])))
+            question_stats.apply_attempts(conn, inserted)
+    finally:
+        conn.close()
+
+def _drain(first=None):
+    batch = [first] if first is not None else []
+    while len(batch) < BATCH_SIZE:
+        try:
+            batch.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+def flush():
+    """כותב כל מה שבתור (נקרא גם ביציאה מהתהליך)"""
+    while True:
+        batch = _drain()
+        if not batch:
+            return
+        try:
+            _write_batch(batch)
+        except Exception as e:
+            print(f"❌ שגיאה בכתיבת יומן ניסיונות: {e}")
+            return
+
+def _run():
+    last_compact = 0
+    while True:
+        try:
+            first = _queue.get(timeout=FLUSH_INTERVAL)
+        except queue.Empty:
+            first = None
+        if first is not None:
+            # מחכים מעט כדי לאסוף מנה, אלא אם כבר יש מנה מלאה
+            if _queue.qsize() < BATCH_SIZE:
+                time.sleep(FLUSH_INTERVAL)
+            try:
+                _write_batch(_drain(first))
+            except Exception as e:
+                print(f"❌ שגיאה בכתיבת יומן ניסיונות: {e}")
+        if time.time() - last_compact > COMPACT_INTERVAL:
+            last_compact = time.time()
+            try:
+                compact()
+            except Exception as e:
+                print(f"❌ שגיאה בדחיסת יומן ניסיונות: {e}")
+
+def _ensure_writer():
+    # ה-thread נוצר בכל תהליך בנפרד (גם אחרי fork של gunicorn)
+    data_manager.start_per_process_thread('attempt-log-writer', _run)
+
+atexit.register(flush)
+
+# ----------------------------------------------------------------------
+# 🗜️ דחיסה
+# ----------------------------------------------------------------------
+ROLLUP_SQL = """
+    INSERT INTO AttemptsDaily (day, uid, question_id, attempts, correct, partial, wrong, latency_ms_total, latency_count)
+    SELECT date(ts, 'unixepoch') AS day, COALESCE(uid, 'id:' || question_id), MAX(question_id), COUNT(*),
+           SUM(status = 'correct'), SUM(status = 'partial'), SUM(status = 'wrong'),
+           COALESCE(SUM(latency_ms), 0), COUNT(latency_ms)
+    FROM Attempts WHERE ts < ?
+    GROUP BY day, COALESCE(uid, 'id:' || question_id)
+    ON CONFLICT (day, uid) DO UPDATE SET
+        attempts = attempts + excluded.attempts,
+        correct = correct + excluded.correct,
+        partial = partial + excluded.partial,
+        wrong = wrong + excluded.wrong,
+        latency_ms_total = latency_ms_total + excluded.latency_ms_total,
+        latency_count = latency_count + excluded.latency_count
+"""
+
+def compact(retention_days=RETENTION_DAYS):
+    """מגלגל שורות ישנות לסיכום יומי (לפי uid, כך שהסיכום שורד בנייה מחדש של המאגר) ומוחק אותן"""
+    cutoff = time.time() - retention_days * 24 * 60 * 60
+    conn = exam_store.get_state_connection()
+    try:
+        with conn:
+            conn.execute(ROLLUP_SQL, (cutoff,))
+            removed = conn.execute("DELETE FROM Attempts WHERE ts < ?", (cutoff,)).rowcount
+    finally:
+        conn.close()
+    return removed
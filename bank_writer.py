@@ -0,0 +1,154 @@
+import json
+import os
+import atexit
+import threading
+
+import data_manager
+
+# עריכות רצופות לאותו קובץ מצטברות ונכתבות יחד אחרי ההשהיה הזו (שניות)
+FLUSH_DELAY = 1.0
+
+_DELETE = object()
+
+class BankFile:
+    """
+    מסמך JSON של מאגר אחד בזיכרון + אינדקס uid -> מיקום ברשימה.
+    נטען מחדש רק אם הקובץ השתנה בדיסק (למשל ע"י worker אחר).
+    """
+    __slots__ = ('path', 'data', 'content', 'index', 'stamp')
+
+    def __init__(self, path):
+        self.path = path
+        self.data, self.content = data_manager.read_bank(path)
+        filename = os.path.basename(path)
+        self.index = {uid: i for i, uid in enumerate(data_manager.assign_uids(self.content, filename)) if uid}
+        self.stamp = _file_stamp(path)
+
+    def apply(self, ops):
+        """מחיל עריכות/מחיקות לפי uid; מחזיר כמה פעולות נמצאו בקובץ"""
+        applied, deleted = 0, set()
+        for uid, new_data in ops.items():
+            pos = self.index.get(uid)
+            if pos is None:
+                continue
+            applied += 1
+            if new_data is _DELETE:
+                deleted.add(pos)
+            else:
+                _update_record(self.content[pos], new_data)
+
+        # כל רשומה מקבלת uid קבוע בקובץ, כדי שהמזהה לא יזוז אחרי מחיקות
+        for uid, pos in self.index.items():
+            self.content[pos].setdefault('uid', uid)
+
+        if deleted:
+            self.content = [q for i, q in enumerate(self.content) if i not in deleted]
+            if isinstance(self.data, dict) and 'fullContent' in self.data:
+                self.data['fullContent'] = self.content
+            else:
+                self.data = self.content
+            self.index = {q['uid']: i for i, q in enumerate(self.content) if isinstance(q, dict) and 'uid' in q}
+        return applied
+
+    def save(self):
+        """כתיבה אטומית: קובץ זמני באותה תיקייה ואז rename"""
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            if data_manager.is_ndjson(self.path):
+                for q in self.content:
+                    f.write(json.dumps(q, ensure_ascii=False) + '\n')
+            else:
+                json.dump(self.data, f, ensure_ascii=False, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self.stamp = _file_stamp(self.path)
+
+def _file_stamp(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+def _update_record(q, new_data):
+    q['question_text'] = new_data['question_text']
+
+    # נסיון להמיר חזרה לרשימה אם זה JSON valid
+    try:
+        parsed = json.loads(new_data['correct_answer'])
+        q['correct_answer'] = parsed if isinstance(parsed, list) else new_data['correct_answer']
+    except:
+        q['correct_answer'] = new_data['correct_answer']
+
+    q['distractor_1'] = new_data['distractor_1']
+    q['distractor_2'] = new_data['distractor_2']
+    q['distractor_3'] = new_data['distractor_3']
+    q['explanation'] = new_data['explanation']
+    q['image'] = new_data['image_path']
+    q['topic'] = new_data['topic']
+    q['sub_topic'] = new_data['sub_topic']
+
+# ----------------------------------------------------------------------
+# ⏳ תור כתיבה עם השהיה
+# ----------------------------------------------------------------------
+_lock = threading.Lock()
+_banks = {}      # path -> BankFile
+_pending = {}    # path -> {uid: new_data | _DELETE}
+_timers = {}     # path -> threading.Timer
+
+def _schedule(path, uid, op):
+    with _lock:
+        _pending.setdefault(path, {})[uid] = op
+        if path not in _timers:
+            timer = threading.Timer(FLUSH_DELAY, flush, args=(path,))
+            timer.daemon = True
+            _timers[path] = timer
+            timer.start()
+
+def update_json_file(filename, uid, new_data):
+    if not os.path.exists(filename): return False
+    _schedule(filename, uid, dict(new_data))
+    return True
+
+def delete_question_from_file(filename, uid):
+    if not os.path.exists(filename): return False
+    _schedule(filename, uid, _DELETE)
+    return True
+
+def flush(path):
+    """כותב לקובץ את כל הפעולות הממתינות שלו; מסונכרן בין workers דרך נעילת הבנייה"""
+    with _lock:
+        ops = _pending.pop(path, None)
+        timer = _timers.pop(path, None)
+    if timer:
+        timer.cancel()
+    if not ops or not os.path.exists(path):
+        return 0
+
+    try:
+        with data_manager.build_lock():
+            bank = _banks.get(path)
+            if bank is None or bank.stamp != _file_stamp(path):
+                bank = _banks[path] = BankFile(path)
+            applied = bank.apply(ops)
+            if applied:
+                bank.save()
+                conn = data_manager.get_db_connection()
+                try:
+                    with conn:
+                        data_manager.record_source_file(conn, path)
+                finally:
+                    conn.close()
+        if applied < len(ops):
+            print(f"⚠️ {len(ops) - applied} שאלות לא נמצאו בקובץ {path}")
+        return applied
+    except Exception as e:
+        _banks.pop(path, None)
+        print(f"❌ שגיאה בכתיבה לקובץ {path}: {e}")
+        return 0
+
+def flush_all():
+    with _lock:
+        paths = list(_pending)
+    for path in paths:
+        flush(path)
+
+atexit.register(flush_all)
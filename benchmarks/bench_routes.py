@@ -0,0 +1,177 @@
+"""
+מדידת ביצועים של נתיבי האפליקציה על מאגרים סינתטיים, ללא רשת.
+
+    python benchmarks/bench_routes.py --sizes 1000 10000 100000 --requests 200
+
+לכל גודל מאגר נוצרת תיקייה זמנית עם קבצי JSON באותו מבנה ש-data_manager.build_database
+מקבל, ותהליך נפרד מייבא את app (זמן עלייה קר) ומריץ את הנתיבים דרך test client.
+מדווחים זמן הקריאה הראשונה (קרה, לפני חימום) ו-p50/p95/p99 לכל נתיב, ושיא זיכרון (tracemalloc בריצה נפרדת + RSS של התהליך).
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUESTIONS_PER_FILE = 5000
+TOPICS = 20
+SUB_TOPICS_PER_TOPIC = 10
+
+# ----------------------------------------------------------------------
+# 🏭 מאגר סינתטי
+# ----------------------------------------------------------------------
+def make_question(rng, i):
+    topic = i % TOPICS
+    sub = (i // TOPICS) % SUB_TOPICS_PER_TOPIC
+    words = ' '.join(f"מילה{rng.randrange(5000)}" for _ in range(25))
+    q = {
+        "question_text": f"שאלה {i}: {words}?",
+        "correct_answer": f"תשובה נכונה {i}",
+        "distractor_1": f"מסיח א {i}",
+        "distractor_2": f"מסיח ב {i}",
+        "distractor_3": f"מסיח ג {i}",
+        "explanation": f"הסבר לשאלה {i}. " + words * 2,
+        "topic": f"נושא {topic}",
+        "sub_topic": f"נושא {topic} / פרק {sub}",
+    }
+    if i % 7 == 0:  # חלק מהשאלות מרובות בחירה
+        q["correct_answer"] = [f"תשובה נכונה {i}", f"מסיח א {i}"]
+    return q
+
+def write_bank(directory, size, seed=0):
+    rng = random.Random(seed)
+    for start in range(0, size, QUESTIONS_PER_FILE):
+        chunk = [make_question(rng, i) for i in range(start, min(start + QUESTIONS_PER_FILE, size))]
+        with open(os.path.join(directory, f"bench_{start // QUESTIONS_PER_FILE:04d}.json"), 'w', encoding='utf-8') as f:
+            json.dump(chunk, f, ensure_ascii=False)
+
+# ----------------------------------------------------------------------
+# ⏱️ מדידה (רץ בתוך תהליך העבודה)
+# ----------------------------------------------------------------------
+def percentile(samples, p):
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(round(p / 100 * (len(s) - 1))))]
+
+def build_scenarios(client, rng):
+    """מחזיר [(שם נתיב, פונקציה שמבצעת בקשה אחת)]"""
+    import data_manager
+    conn = data_manager.get_db_connection(readonly=True)
+    ids = [r['id'] for r in conn.execute('SELECT id FROM Questions')]
+    sub_topic = conn.execute('SELECT sub_topic FROM Questions LIMIT 1').fetchone()['sub_topic']
+    conn.close()
+
+    def exam_started():
+        client.post('/start_exam', data={'sub_topic': sub_topic})
+
+    def exam_answer():
+        client.post('/exam/0', data={'selected_answer': 'x', 'action': 'next'})
+
+    return [
+        ('/', lambda: client.get('/')),
+        ('/question/<id>', lambda: client.get(f'/question/{rng.choice(ids)}')),
+        ('/check_answer', lambda: client.post('/check_answer', data={'question_id': rng.choice(ids), 'selected_answer': 'x'})),
+        ('/start_exam', exam_started),
+        ('/exam/<i> GET', lambda: client.get('/exam/1')),
+        ('/exam/<i> POST', exam_answer),
+        ('/submit_exam', lambda: client.get('/submit_exam')),
+    ]
+
+def run_worker(directory, size, requests, warmup):
+    os.chdir(directory)
+    sys.path.insert(0, REPO_DIR)
+
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+    cold_start = time.perf_counter() - t0
+
+    client = app.app.test_client()
+    rng = random.Random(1)
+
+    t0 = time.perf_counter()
+    client.get('/question/1')
+    first_request = time.perf_counter() - t0
+
+    result = {'size': size, 'cold_start': cold_start, 'first_request': first_request, 'routes': {}}
+    for name, call in build_scenarios(client, rng):
+        # הקריאה הראשונה לכל נתיב נמדדת לפני החימום: בנייה עצלה של מטמונים ותבניות נראית רק כאן
+        t0 = time.perf_counter()
+        call()
+        cold = time.perf_counter() - t0
+        for _ in range(warmup):
+            call()
+        samples = []
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            call()
+            samples.append(time.perf_counter() - t0)
+
+        # זיכרון נמדד בריצה קצרה נפרדת כדי לא לעוות את זמני התגובה
+        tracemalloc.start()
+        for _ in range(min(requests, 20)):
+            call()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        result['routes'][name] = {
+            'cold': cold, 'p50': percentile(samples, 50), 'p95': percentile(samples, 95), 'p99': percentile(samples, 99),
+            'peak_alloc': peak,
+        }
+    result['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return result
+
+# ----------------------------------------------------------------------
+# 🧾 דו"ח
+# ----------------------------------------------------------------------
+def run_size(size, requests, warmup):
+    with tempfile.TemporaryDirectory(prefix=f"quiz_bench_{size}_") as directory:
+        write_bank(directory, size)
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', directory, str(size),
+             '--requests', str(requests), '--warmup', str(warmup)],
+            capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def print_report(result):
+    ms = lambda s: f"{s * 1000:8.2f}"
+    print(f"\n=== {result['size']:,} שאלות | עלייה קרה {result['cold_start']:.2f}s | "
+          f"בקשה ראשונה {result['first_request'] * 1000:.1f}ms | RSS {result['max_rss_kb'] / 1024:.0f}MB ===")
+    print(f"{'route':<18}{'cold ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'peak KB':>10}")
+    for name, r in result['routes'].items():
+        print(f"{name:<18}{ms(r['cold'])} {ms(r['p50'])} {ms(r['p95'])} {ms(r['p99'])}{r['peak_alloc'] / 1024:10.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="מדידת ביצועים של נתיבי המבחן")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--requests', type=int, default=200, help="בקשות נמדדות לכל נתיב")
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--json', help="שמירת התוצאות לקובץ (להשוואה בין גרסאות)")
+    parser.add_argument('--worker', nargs=2, metavar=('DIR', 'SIZE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        directory, size = args.worker
+        print(json.dumps(run_worker(directory, int(size), args.requests, args.warmup)))
+        return
+
+    results = []
+    for size in args.sizes:
+        result = run_size(size, args.requests, args.warmup)
+        print_report(result)
+        results.append(result)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+דחיסת תשובות (brotli אם הלקוח תומך והספרייה מותקנת, אחרת gzip) מעל סף גודל.
+עמודי השאלה והתוצאות כוללים את כל מפת השאלות וההסברים, ודוחסים היטב.
+קבצים שמוגשים מהדיסק (תמונות) וזרמים לא נדחסים.
+"""
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # בלי brotli - רק gzip
+    brotli = None
+
+# תשובה קטנה מזה לא שווה את ה-CPU (נכנסת ממילא בחבילת TCP אחת)
+COMPRESS_MIN_SIZE = 1400
+COMPRESS_MIMETYPES = {'text/html', 'text/plain', 'text/css', 'text/javascript',
+                      'application/json', 'application/javascript'}
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+def _choose_encoding(accept_encoding):
+    if brotli is not None and accept_encoding['br']:
+        return 'br'
+    if accept_encoding['gzip']:
+        return 'gzip'
+    return None
+
+def compress_response(response):
+    response.vary.add('Accept-Encoding')
+    if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESS_MIMETYPES):
+        return response
+    encoding = _choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+    if encoding == 'br':
+        data = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        data = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    # הייצוג הדחוס שונה בבתים מהמקורי - ETag חזק הופך לחלש (If-None-Match משווה בהשוואה חלשה)
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+def init_app(app):
+    app.after_request(compress_response)
@@ -1,36 +1,176 @@
 import sqlite3
 import json
 import os
+import re
+import html
+import hashlib
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows - אין נעילת קבצים, בונים בלי נעילה
+    fcntl = None
 
 DB_FILE = 'quiz_db.sqlite'
+LOCK_FILE = DB_FILE + '.lock'
+
+# להעלות בכל שינוי סכמה - DB עם גרסה אחרת נבנה מחדש מאפס
+SCHEMA_VERSION = 5
+
+# ----------------------------------------------------------------------
+# 🔌 חיבורים משותפים
+# ----------------------------------------------------------------------
+# PRAGMA-ות לכל חיבור; WAL מאפשר לקוראים לעבוד בזמן עריכה
+SQLITE_PRAGMAS = (
+    ('busy_timeout', 5000),
+    ('mmap_size', 256 * 1024 * 1024),
+    ('cache_size', -16000),  # ~16MB
+    ('temp_store', 'MEMORY'),
+)
+SQLITE_WRITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+)
+# כמה שאילתות מוכנות (prepared statements) נשמרות לכל חיבור
+SQLITE_STATEMENT_CACHE = 256
+
+class PooledConnection(sqlite3.Connection):
+    """
+    חיבור שנשמר לכל thread וממוחזר בין בקשות.
+    close() רק מבטל טרנזקציה פתוחה; הסגירה האמיתית היא dispose().
+    """
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def dispose(self):
+        super().close()
+
+# metrics.init_app מחליף את זה בגרסה מודדת
+CONNECTION_FACTORY = PooledConnection
 
-def get_db_connection():
-    # check_same_thread=False מאפשר גמישות בעבודה עם Flask
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+_local = threading.local()
+
+def _open_connection(db_file, readonly):
+    if readonly:
+        conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True, check_same_thread=False,
+                               factory=CONNECTION_FACTORY, cached_statements=SQLITE_STATEMENT_CACHE)
+    else:
+        conn = sqlite3.connect(db_file, check_same_thread=False,
+                               factory=CONNECTION_FACTORY, cached_statements=SQLITE_STATEMENT_CACHE)
+        for name, value in SQLITE_WRITE_PRAGMAS:
+            conn.execute(f"PRAGMA {name}={value}")
+    for name, value in SQLITE_PRAGMAS:
+        conn.execute(f"PRAGMA {name}={value}")
     conn.row_factory = sqlite3.Row
     return conn
 
+def get_db_connection(readonly=False, db_file=DB_FILE):
+    """
+    מחזיר את החיבור של ה-thread הנוכחי (נפתח פעם אחת לכל thread / קובץ / מצב).
+    readonly=True פותח חיבור קריאה בלבד לנתיבי הקריאה.
+    """
+    pid = os.getpid()
+    if getattr(_local, 'pid', None) != pid:
+        # אחרי fork (gunicorn --preload) אסור להשתמש בחיבורים של תהליך האב
+        _local.pid = pid
+        _local.conns = {}
+    key = (db_file, readonly)
+    conn = _local.conns.get(key)
+    if conn is None:
+        conn = _local.conns[key] = _open_connection(db_file, readonly)
+    return conn
+
+def release_db_connections():
+    """נקרא בסוף כל בקשה: מבטל טרנזקציות שנשארו פתוחות בחיבורים של ה-thread"""
+    for conn in getattr(_local, 'conns', {}).values():
+        conn.close()
+
+def dispose_db_connections():
+    for conn in getattr(_local, 'conns', {}).values():
+        conn.dispose()
+    _local.conns = {}
+
+# ----------------------------------------------------------------------
+# 🧵 threads רקע לכל תהליך
+# ----------------------------------------------------------------------
+_process_threads = {}
+_process_threads_lock = threading.Lock()
+
+def start_per_process_thread(name, target, *args):
+    """
+    מפעיל thread רקע (daemon) אחד בשם name בכל תהליך, אם עוד לא רץ בו.
+    thread לא עובר fork (gunicorn --preload), ולכן הבדיקה לפי pid ולא רק is_alive.
+    """
+    pid = os.getpid()
+    thread = _process_threads.get(name)
+    if thread is not None and thread.pid == pid and thread.is_alive():
+        return thread
+    with _process_threads_lock:
+        thread = _process_threads.get(name)
+        if thread is not None and thread.pid == pid and thread.is_alive():
+            return thread
+        thread = _process_threads[name] = threading.Thread(target=target, args=args, name=name, daemon=True)
+        thread.pid = pid
+        thread.start()
+    return thread
+
+def create_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS Questions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            question_text TEXT NOT NULL,
+            correct_answer TEXT NOT NULL,
+            distractor_1 TEXT,
+            distractor_2 TEXT,
+            distractor_3 TEXT,
+            explanation TEXT,
+            topic TEXT,
+            sub_topic TEXT,
+            image_path TEXT,
+            source_file TEXT,
+            uid TEXT
+        );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_questions_topic ON Questions (topic);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_questions_sub_topic ON Questions (sub_topic);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_questions_topic_sub ON Questions (topic, sub_topic, id);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_questions_source ON Questions (source_file);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_questions_uid ON Questions (uid);")
+    # מניפסט של קבצי המקור - מאפשר לדלג על קבצים שלא השתנו
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS SourceFiles (
+            path TEXT PRIMARY KEY,
+            mtime REAL NOT NULL,
+            size INTEGER NOT NULL,
+            content_hash TEXT NOT NULL,
+            loaded_at REAL NOT NULL
+        );
+    """)
+    # אינדקס חיפוש טקסט מלא; rowid = Questions.id, הטקסט שמור מנורמל
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS QuestionsSearch USING fts5(
+            question_text, answers, explanation,
+            tokenize = 'unicode61 remove_diacritics 2'
+        );
+    """)
+    conn.execute("CREATE TABLE IF NOT EXISTS Meta (key TEXT PRIMARY KEY, value TEXT);")
+    conn.execute("INSERT OR REPLACE INTO Meta (key, value) VALUES ('schema_version', ?);", (str(SCHEMA_VERSION),))
+
 def rebuild_database():
-    """מוחק את הטבלה ויוצר אותה מחדש נקייה"""
+    """מוחק את הטבלאות ויוצר אותן מחדש נקיות"""
     print("♻️  בונה מחדש את מסד הנתונים...")
     conn = get_db_connection()
     try:
         conn.execute("DROP TABLE IF EXISTS Questions;")
-        conn.execute("""
-            CREATE TABLE Questions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                question_text TEXT NOT NULL,
-                correct_answer TEXT NOT NULL,
-                distractor_1 TEXT,
-                distractor_2 TEXT,
-                distractor_3 TEXT,
-                explanation TEXT,
-                topic TEXT,
-                sub_topic TEXT,
-                image_path TEXT,
-                source_file TEXT
-            );
-        """)
+        conn.execute("DROP TABLE IF EXISTS SourceFiles;")
+        conn.execute("DROP TABLE IF EXISTS QuestionsSearch;")
+        conn.execute("DROP TABLE IF EXISTS Meta;")
+        create_tables(conn)
         conn.commit()
         print("✅ טבלאות נוצרו בהצלחה.")
     except Exception as e:
@@ -38,150 +178,588 @@ def rebuild_database():
     finally:
         conn.close()
 
-def insert_question(question_data: dict, filename: str):
+def get_bank_version(conn):
+    """מונה שעולה בכל שינוי בתוכן המאגר - משותף לכל ה-workers דרך ה-DB"""
+    try:
+        row = conn.execute("SELECT value FROM Meta WHERE key='bank_version'").fetchone()
+    except sqlite3.Error:
+        return 0
+    return int(row['value']) if row else 0
+
+def bump_bank_version(conn):
+    conn.execute("""
+        INSERT INTO Meta (key, value) VALUES ('bank_version', '1')
+        ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1;
+    """)
+
+def update_question(question_id, new_data: dict):
     conn = get_db_connection()
     try:
-        cursor = conn.cursor()
-        
-        q_text = question_data.get('question_text')
-        c_answer = question_data.get('correct_answer')
-        
-        # המרה ל-JSON string אם זו רשימה (עבור בחירה מרובה)
-        if isinstance(c_answer, list):
-            c_answer = json.dumps(c_answer, ensure_ascii=False)
-        # המרה למחרוזת אם זה מספר או משהו אחר
-        else:
-            c_answer = str(c_answer)
-
-        if not q_text or not c_answer:
-            return False
-
-        sql = """
-            INSERT INTO Questions (
-                question_text, correct_answer, distractor_1, distractor_2, 
-                distractor_3, explanation, topic, sub_topic, image_path, source_file
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
-        """
-        
-        cursor.execute(sql, (
-            q_text, 
-            c_answer, 
-            str(question_data.get('distractor_1', '') or ''), 
-            str(question_data.get('distractor_2', '') or ''), 
-            str(question_data.get('distractor_3', '') or ''), 
-            question_data.get('explanation', ''), 
-            question_data.get('topic', 'כללי'), 
-            question_data.get('sub_topic', 'ללא פרק'),
-            question_data.get('image', ''), # שים לב: ב-JSON זה 'image', ב-DB זה 'image_path'
-            filename
-        ))
-        conn.commit()
-        return True
-    except sqlite3.Error as e:
-        print(f"❌ שגיאה בהכנסת שאלה: {e}")
-        return False
+        with conn:
+            conn.execute('''
+                UPDATE Questions SET 
+                question_text=?, correct_answer=?, distractor_1=?, distractor_2=?, 
+                distractor_3=?, explanation=?, topic=?, sub_topic=?, image_path=?
+                WHERE id=?
+            ''', (new_data['question_text'], new_data['correct_answer'], new_data['distractor_1'],
+                  new_data['distractor_2'], new_data['distractor_3'], new_data['explanation'],
+                  new_data['topic'], new_data['sub_topic'], new_data['image_path'], question_id))
+            index_questions(conn, 'id = ?', (question_id,))
+            bump_bank_version(conn)
+    finally:
+        conn.close()
+
+def delete_question(question_id):
+    conn = get_db_connection()
+    try:
+        with conn:
+            conn.execute('DELETE FROM QuestionsSearch WHERE rowid = ?', (question_id,))
+            conn.execute('DELETE FROM Questions WHERE id = ?', (question_id,))
+            bump_bank_version(conn)
     finally:
         conn.close()
 
-def load_questions_from_file(file_path: str):
-    if not os.path.exists(file_path):
+def get_schema_version(conn):
+    try:
+        row = conn.execute("SELECT value FROM Meta WHERE key='schema_version'").fetchone()
+    except sqlite3.Error:
+        return None
+    return int(row['value']) if row else None
+
+INSERT_SQL = """
+    INSERT INTO Questions (
+        question_text, correct_answer, distractor_1, distractor_2, 
+        distractor_3, explanation, topic, sub_topic, image_path, source_file, uid
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+"""
+
+def question_uid(question_data: dict, filename: str, occurrence: int = 0):
+    """
+    מזהה יציב לשאלה. נלקח מהשדה 'uid' ב-JSON; לשאלות ישנות בלי uid נגזר
+    מהקובץ והטקסט (כך שהוספה / מחיקה של שאלות אחרות לא מזיזה אותו),
+    והוא נכתב לקובץ בשמירה הראשונה (bank_writer).
+    occurrence מבדיל בין שאלות עם טקסט זהה באותו קובץ.
+    """
+    uid = question_data.get('uid')
+    if uid:
+        return str(uid)
+    seed = f"{filename}:{question_data.get('question_text', '')}"
+    if occurrence:
+        seed += f":{occurrence}"
+    return hashlib.sha1(seed.encode('utf-8')).hexdigest()[:16]
+
+def _next_uid(q, filename: str, seen: dict):
+    """uid לרשומה הבאה בקובץ; seen סופר מופעים של אותו טקסט (לפי ה-uid הבסיסי, לא הטקסט עצמו)"""
+    if q.get('uid'):
+        return str(q['uid'])
+    base = question_uid(q, filename)
+    occurrence = seen.get(base, 0)
+    seen[base] = occurrence + 1
+    return question_uid(q, filename, occurrence) if occurrence else base
+
+def assign_uids(content, filename: str):
+    """uid לכל רשומה ברשימה (None לרשומות שאינן dict), באותו סדר"""
+    seen = {}
+    return [_next_uid(q, filename, seen) if isinstance(q, dict) else None for q in content]
+
+def question_error(question_data):
+    """סיבת הדחייה של רשומה, או None אם היא תקינה (אותם כללים כמו normalize_question)"""
+    if not isinstance(question_data, dict):
+        return "הרשומה אינה אובייקט"
+    if not question_data.get('question_text'):
+        return "חסר question_text"
+    c_answer = question_data.get('correct_answer')
+    if c_answer is None or c_answer == [] or c_answer == '':
+        return "חסר correct_answer"
+    return None
+
+def normalize_question(question_data, filename: str, uid=None):
+    """ממיר רשומת JSON לשורה מוכנה להכנסה. מחזיר None אם הרשומה לא תקינה"""
+    if not isinstance(question_data, dict):
+        return None
+
+    q_text = question_data.get('question_text')
+    c_answer = question_data.get('correct_answer')
+
+    # המרה ל-JSON string אם זו רשימה (עבור בחירה מרובה)
+    if isinstance(c_answer, list):
+        c_answer = json.dumps(c_answer, ensure_ascii=False) if c_answer else None
+    # המרה למחרוזת אם זה מספר או משהו אחר
+    elif c_answer is not None:
+        c_answer = str(c_answer)
+
+    if not q_text or not c_answer:
+        return None
+
+    return (
+        q_text,
+        c_answer,
+        str(question_data.get('distractor_1', '') or ''),
+        str(question_data.get('distractor_2', '') or ''),
+        str(question_data.get('distractor_3', '') or ''),
+        question_data.get('explanation', ''),
+        question_data.get('topic', 'כללי'),
+        question_data.get('sub_topic', 'ללא פרק'),
+        question_data.get('image', ''), # שים לב: ב-JSON זה 'image', ב-DB זה 'image_path'
+        filename,
+        uid or question_uid(question_data, filename)
+    )
+
+def is_ndjson(file_path: str):
+    return file_path.lower().endswith(NDJSON_EXTENSIONS)
+
+def read_bank(file_path: str):
+    """מחזיר (המסמך המלא, רשימת השאלות שבתוכו) - לכתיבה חזרה לקובץ; לטעינה יש iter_records"""
+    if is_ndjson(file_path):
+        with open(file_path, 'r', encoding='utf-8-sig') as f:
+            content = [json.loads(line) for line in f if line.strip()]
+        return content, content
+
+    with open(file_path, 'r', encoding='utf-8-sig') as f:
+        data = json.load(f)
+
+    # תמיכה בפורמט dict עם fullContent או list ישיר
+    content = data
+    if isinstance(data, dict) and 'fullContent' in data:
+        content = data['fullContent']
+    if isinstance(content, dict):
+        content = [content]
+    elif not isinstance(content, list):
+        content = []
+    return data, content
+
+# ----------------------------------------------------------------------
+# 🌊 קריאה בזרימה (NDJSON ומערכים גדולים)
+# ----------------------------------------------------------------------
+NDJSON_EXTENSIONS = ('.ndjson', '.jsonl')
+STREAM_CHUNK_SIZE = 1 << 16
+_JSON_WS = ' \t\r\n'
+# מספר שמגיע עד סוף ה-buffer אולי ממשיך ב-chunk הבא ("12" ואחריו ".5" או "e3")
+_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*\Z')
+
+def _iter_json_array(f):
+    """
+    מפרק מערך JSON ברמה העליונה רשומה אחר רשומה. בזיכרון נמצאים רק ה-chunk הנוכחי
+    והרשומה שבפענוח, לא המסמך כולו.
+    """
+    decoder = json.JSONDecoder()
+    state = {'buf': f.read(STREAM_CHUNK_SIZE), 'pos': 0, 'eof': False}
+
+    def more():
+        chunk = f.read(STREAM_CHUNK_SIZE)
+        state['eof'] = not chunk
+        state['buf'] = state['buf'][state['pos']:] + chunk
+        state['pos'] = 0
+
+    def peek():
+        """התו הבא שאינו רווח ('' בסוף הקובץ)"""
+        while True:
+            buf, pos = state['buf'], state['pos']
+            while pos < len(buf) and buf[pos] in _JSON_WS:
+                pos += 1
+            state['pos'] = pos
+            if pos < len(buf) or state['eof']:
+                return buf[pos:pos+1]
+            more()
+
+    if peek() != '[':
+        raise json.JSONDecodeError("Expecting '['", state['buf'], state['pos'])
+    state['pos'] += 1
+    if peek() == ']':
         return
 
-    print(f"--- טוען קובץ: {file_path} ---")
+    index = 0
+    while True:
+        peek()
+        while True:
+            try:
+                obj, end = decoder.raw_decode(state['buf'], state['pos'])
+                # ערך שנגמר בסוף ה-buffer (או מספר שרק תווי מספר אחריו) אולי נחתך באמצע
+                truncated = end == len(state['buf']) or (
+                    isinstance(obj, (int, float)) and not isinstance(obj, bool)
+                    and _NUMBER_TAIL.match(state['buf'], end))
+                if state['eof'] or not truncated:
+                    break
+            except json.JSONDecodeError:
+                if state['eof']:
+                    raise
+            more()
+        state['pos'] = end
+        yield index, obj
+        index += 1
+
+        c = peek()
+        if c == ',':
+            state['pos'] += 1
+        elif c == ']':
+            return
+        else:
+            raise json.JSONDecodeError("Expecting ',' delimiter", state['buf'], state['pos'])
+
+def iter_records(file_path: str):
+    """
+    מחזיר (מיקום, רשומה, שגיאה) לכל רשומה בקובץ - בזרימה ל-NDJSON (מיקום = מספר שורה)
+    ולמערך JSON (מיקום = אינדקס). מסמך עוטף ({"fullContent": [...]} או שאלה בודדת)
+    נקרא בשלמותו כמו קודם. שורת NDJSON פגומה מדווחת ומדולגת; מערך פגום עוצר את הקריאה.
+    שורה אחרונה פגומה בלי ירידת שורה היא כנראה קובץ באמצע כתיבה - זו שגיאת קריאה ולא רשומה
+    שנדחתה, אחרת הסנכרון היה מוחק את כל השאלות שאחרי נקודת הקיטוע.
+    """
+    with open(file_path, 'r', encoding='utf-8-sig') as f:
+        if is_ndjson(file_path):
+            for lineno, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield lineno, json.loads(line), None
+                except json.JSONDecodeError as e:
+                    if not line.endswith('\n'):
+                        raise
+                    yield lineno, None, f"JSON לא תקין: {e.msg}"
+            return
+
+        head = f.read(STREAM_CHUNK_SIZE).lstrip(_JSON_WS)
+        f.seek(0)
+        if head.startswith('['):
+            for index, q in _iter_json_array(f):
+                yield index, q, None
+            return
+
+    _, content = read_bank(file_path)
+    for index, q in enumerate(content):
+        yield index, q, None
+
+def iter_rows(file_path: str):
+    """(מיקום, שורה מוכנה להכנסה, None) לכל רשומה תקינה ו-(מיקום, None, סיבה) לכל רשומה שנדחתה"""
+    filename = os.path.basename(file_path)
+    seen = {}
+    for pos, q, error in iter_records(file_path):
+        if error is None:
+            # ה-uid נספר גם לרשומות לא תקינות, כמו ב-assign_uids
+            uid = _next_uid(q, filename, seen) if isinstance(q, dict) else None
+            error = question_error(q)
+        if error is not None:
+            yield pos, None, error
+        else:
+            yield pos, normalize_question(q, filename, uid), None
+
+UPDATE_SQL = """
+    UPDATE Questions SET
+        question_text=?, correct_answer=?, distractor_1=?, distractor_2=?,
+        distractor_3=?, explanation=?, topic=?, sub_topic=?, image_path=?, source_file=?, uid=?
+    WHERE id=?;
+"""
+
+# גודל מנה בסנכרון קובץ; בזיכרון יש מנה אחת ולא כל הקובץ
+SYNC_BATCH_SIZE = 1000
+# כמה רשומות שנדחו מודפסות לכל קובץ (כשאין on_error)
+MAX_REPORTED_ERRORS = 10
+
+def sync_source_file(conn, file_path: str, batch_size=SYNC_BATCH_SIZE, progress=None, on_error=None,
+                     commit_batches=False, rows=None):
+    """
+    מסנכרן את השורות של קובץ אחד מול התוכן שלו לפי uid: שאלות קיימות מתעדכנות
+    במקום (ה-id נשמר - קישורים ובחינות פתוחות ממשיכים לעבוד), חדשות נוספות
+    וכאלה שהוסרו מהקובץ נמחקות. לא נוגע בקבצים אחרים.
+
+    הקובץ נקרא בזרימה ונכתב במנות של batch_size. כברירת מחדל הכול בתוך savepoint
+    והקורא אחראי ל-commit; עם commit_batches כל מנה נשמרת מיד (לייבוא גדול מה-CLI -
+    קובץ שנקטע באמצע ישלים את עצמו בסנכרון הבא, כי ההתאמה לפי uid).
+    progress(filename, processed, rejected) נקרא אחרי כל מנה; on_error(filename, pos, reason)
+    לכל רשומה שנדחתה. rows - רשומות שכבר פוענחו (בפורמט של iter_rows), למשל בתהליך אחר.
+    מחזיר None אם לא ניתן לקרוא את הקובץ (למשל באמצע כתיבה) - השורות הקיימות נשארות.
+    """
+    print(f"--- מסנכרן קובץ: {file_path} ---")
+    filename = os.path.basename(file_path)
+
+    existing = {}
+    for r in conn.execute('SELECT id, uid FROM Questions WHERE source_file=? ORDER BY id', (filename,)):
+        existing.setdefault(r['uid'], []).append(r['id'])
+
+    counts = {'updated': 0, 'inserted': 0, 'rejected': 0}
+
+    def write(batch):
+        updates, inserts = [], []
+        for row in batch:
+            ids = existing.get(row[-1])
+            if ids:
+                updates.append(row + (ids.pop(0),))
+            else:
+                inserts.append(row)
+        conn.executemany(UPDATE_SQL, updates)
+        conn.executemany(INSERT_SQL, inserts)
+        counts['updated'] += len(updates)
+        counts['inserted'] += len(inserts)
+        if commit_batches:
+            conn.commit()
+        if progress:
+            progress(filename, counts['updated'] + counts['inserted'] + counts['rejected'], counts['rejected'])
+
+    if not commit_batches:
+        # SAVEPOINT מחוץ לטרנזקציה פותח טרנזקציה משלו ש-RELEASE כבר מאשר; עם BEGIN מפורש
+        # ה-commit נשאר אצל הקורא, יחד עם המניפסט והעלאת הגרסה
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        conn.execute("SAVEPOINT sync_file")
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-            # תמיכה בפורמט dict עם fullContent או list ישיר
-            content = data
-            if isinstance(data, dict) and 'fullContent' in data:
-                content = data['fullContent']
-
-            count = 0
-            filename = os.path.basename(file_path)
-
-            if isinstance(content, list):
-                for q in content:
-                    if insert_question(q, filename): count += 1
-            elif isinstance(content, dict):
-                if insert_question(content, filename): count += 1
-            
-            print(f"✅ נטענו {count} שאלות מתוך {filename}.")
+        batch = []
+        for pos, row, error in (iter_rows(file_path) if rows is None else rows):
+            if error is not None:
+                counts['rejected'] += 1
+                if on_error:
+                    on_error(filename, pos, error)
+                elif counts['rejected'] <= MAX_REPORTED_ERRORS:
+                    print(f"   ⚠️ {filename} [{pos}]: {error}")
+                continue
+            batch.append(row)
+            if len(batch) >= batch_size:
+                write(batch)
+                batch = []
+        write(batch)
 
-    except Exception as e:
+        stale = [(i,) for ids in existing.values() for i in ids]
+        conn.executemany('DELETE FROM QuestionsSearch WHERE rowid = ?', stale)
+        conn.executemany('DELETE FROM Questions WHERE id = ?', stale)
+        index_questions(conn, 'source_file = ?', (filename,))
+    except (OSError, ValueError) as e:
+        # ValueError כולל JSONDecodeError ו-UnicodeDecodeError
+        if not commit_batches:
+            conn.execute("ROLLBACK TO sync_file")
+            conn.execute("RELEASE sync_file")
         print(f"❌ שגיאה בטעינת הקובץ {file_path}: {e}")
+        return None
+    except sqlite3.Error:
+        if not commit_batches:
+            conn.execute("ROLLBACK TO sync_file")
+            conn.execute("RELEASE sync_file")
+        raise
+    if not commit_batches:
+        conn.execute("RELEASE sync_file")
+
+    msg = f"✅ {filename}: {counts['updated']} עודכנו, {counts['inserted']} נוספו, {len(stale)} נמחקו."
+    if counts['rejected']:
+        msg += f" (נדחו {counts['rejected']} רשומות לא תקינות)"
+    print(msg)
+    return counts['updated'] + counts['inserted']
+
+def delete_source_rows(conn, filename):
+    conn.execute('DELETE FROM QuestionsSearch WHERE rowid IN (SELECT id FROM Questions WHERE source_file=?)', (filename,))
+    conn.execute('DELETE FROM Questions WHERE source_file=?', (filename,))
 
-def update_json_file(filename, original_q_text, new_data):
-    if not os.path.exists(filename): return False, "קובץ לא נמצא"
+# ----------------------------------------------------------------------
+# 🔎 חיפוש טקסט מלא (FTS5)
+# ----------------------------------------------------------------------
+_NIQQUD_RE = re.compile(r'[\u0591-\u05BD\u05BF\u05C1\u05C2\u05C4\u05C5\u05C7]')
+_NON_WORD_RE = re.compile(r'[^a-z0-9א-ת]+')
+
+def normalize_search_text(text):
+    """כמו clean_text_for_comparison, אבל שומר גבולות מילים לצורך האינדקס"""
+    if not text: return ""
+    text = _NIQQUD_RE.sub('', html.unescape(str(text)).lower())
+    return _NON_WORD_RE.sub(' ', text).strip()
+
+def index_questions(conn, where, params=()):
+    """(מחדש) מאנדקס את השאלות שעונות על תנאי ה-WHERE, במנות כדי לא להחזיק קובץ שלם בזיכרון"""
+    cursor = conn.execute(f'SELECT * FROM Questions WHERE {where}', params)
+    while True:
+        rows = cursor.fetchmany(SYNC_BATCH_SIZE)
+        if not rows:
+            break
+        conn.executemany('DELETE FROM QuestionsSearch WHERE rowid = ?', [(r['id'],) for r in rows])
+        conn.executemany(
+            'INSERT INTO QuestionsSearch (rowid, question_text, answers, explanation) VALUES (?, ?, ?, ?)',
+            [(r['id'],
+              normalize_search_text(r['question_text']),
+              normalize_search_text(' '.join([r['correct_answer'], r['distractor_1'] or '', r['distractor_2'] or '', r['distractor_3'] or ''])),
+              normalize_search_text(r['explanation']))
+             for r in rows])
+
+def search_questions(query, page=1, per_page=20):
+    """מחזיר (תוצאות, סה"כ) מדורגות לפי bm25; כל מילה בשאילתה מתאימה גם כתחילית"""
+    tokens = normalize_search_text(query).split()
+    if not tokens:
+        return [], 0
+    match = ' '.join(f'"{t}"*' for t in tokens)
+    offset = (max(page, 1) - 1) * per_page
+
+    conn = get_db_connection(readonly=True)
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # זיהוי מבנה הקובץ
-        content_list = data
-        is_wrapper = False
-        if isinstance(data, dict) and 'fullContent' in data:
-            content_list = data['fullContent']
-            is_wrapper = True
-        
-        found = False
-        for q in content_list:
-            if q.get('question_text') == original_q_text:
-                q['question_text'] = new_data['question_text']
-                
-                # נסיון להמיר חזרה לרשימה אם זה JSON valid
+        total = conn.execute('SELECT COUNT(*) AS cnt FROM QuestionsSearch WHERE QuestionsSearch MATCH ?', (match,)).fetchone()['cnt']
+        rows = conn.execute("""
+            SELECT q.id, q.question_text, q.topic, q.sub_topic,
+                   snippet(QuestionsSearch, -1, '<mark>', '</mark>', '…', 12) AS snippet
+            FROM QuestionsSearch
+            JOIN Questions q ON q.id = QuestionsSearch.rowid
+            WHERE QuestionsSearch MATCH ?
+            ORDER BY bm25(QuestionsSearch, 3.0, 1.5, 1.0)
+            LIMIT ? OFFSET ?
+        """, (match, per_page, offset)).fetchall()
+    finally:
+        conn.close()
+    return [dict(r) for r in rows], total
+
+# ----------------------------------------------------------------------
+# 📦 בנייה אינקרמנטלית לפי מניפסט
+# ----------------------------------------------------------------------
+@contextmanager
+def build_lock():
+    """נעילה בין תהליכים - רק worker אחד בונה, השאר ממתינים ל-DB מוכן"""
+    if fcntl is None:
+        yield
+        return
+    with open(LOCK_FILE, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def file_hash(file_path: str):
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def source_key(path):
+    """
+    המפתח של קובץ במניפסט: שם הקובץ בלבד, כמו Questions.source_file. כך ייבוא מה-CLI
+    עם ./x.json או נתיב מלא ועליית השרת (glob יחסי) רואים את אותו קובץ ולא מוחקים זה לזה.
+    """
+    return os.path.basename(path)
+
+def _normalize_manifest(conn):
+    """ממיר שורות מניפסט ישנות שנשמרו עם הנתיב כפי שהועבר; שורה מנורמלת קיימת גוברת"""
+    for r in conn.execute('SELECT path FROM SourceFiles').fetchall():
+        key = source_key(r['path'])
+        if key != r['path']:
+            with conn:
+                conn.execute('INSERT OR IGNORE INTO SourceFiles (path, mtime, size, content_hash, loaded_at) '
+                             'SELECT ?, mtime, size, content_hash, loaded_at FROM SourceFiles WHERE path=?',
+                             (key, r['path']))
+                conn.execute('DELETE FROM SourceFiles WHERE path=?', (r['path'],))
+
+def record_source_file(conn, path):
+    """מעדכן את המניפסט אחרי שהאפליקציה עצמה כתבה לקובץ - כדי שלא ייטען מחדש"""
+    st = os.stat(path)
+    conn.execute('INSERT OR REPLACE INTO SourceFiles (path, mtime, size, content_hash, loaded_at) VALUES (?, ?, ?, ?, ?)',
+                 (source_key(path), st.st_mtime, st.st_size, file_hash(path), time.time()))
+
+# ----------------------------------------------------------------------
+# ⚡ פענוח מקבילי
+# ----------------------------------------------------------------------
+# כמה תהליכים מפענחים קבצים במקביל לכתיבה (1 = הכול בתהליך הכותב)
+IMPORT_WORKERS = int(os.environ.get('QUIZ_IMPORT_WORKERS', str(min(os.cpu_count() or 1, 8))))
+# מתחת לזה (סה"כ בתים לטעינה) הרמת התהליכים עולה יותר מהחיסכון
+PARALLEL_MIN_BYTES = 4 * 1024 * 1024
+# קובץ גדול מזה נקרא בזרימה ע"י הכותב - עובד היה מחזיק את כל השורות שלו בזיכרון
+PARALLEL_MAX_FILE_BYTES = 64 * 1024 * 1024
+
+def _parse_rows(file_path):
+    return list(iter_rows(file_path))
+
+def _replay(future):
+    # שגיאת קריאה בעובד נזרקת כאן, בתוך sync_source_file, כמו בקריאה רגילה
+    yield from future.result()
+
+def _parsed_sources(paths, workers):
+    """
+    מחזיר (path, rows) לפי הסדר של paths; rows הוא None לקבצים שייקראו בזרימה.
+    הקבצים מפוענחים מראש בתהליכים נפרדים (עד workers*2 ממתינים), אבל נכתבים רק
+    בסדר הקבוע של paths ע"י כותב יחיד - כך ה-ids זהים לטעינה סדרתית.
+    """
+    sizes = {}
+    for p in paths:
+        try:
+            sizes[p] = os.path.getsize(p)
+        except OSError:
+            sizes[p] = 0
+    parallel = [p for p in paths if sizes[p] <= PARALLEL_MAX_FILE_BYTES]
+    # העובדים נוצרים ב-fork: spawn היה מייבא מחדש את app.py, שבונה את ה-DB בעצמו וננעל על build_lock.
+    # fork בטוח רק כשאין threads נוספים - כלומר בעלייה וב-CLI; טעינה חמה (מתוך ה-watcher) סדרתית
+    if (workers < 2 or len(parallel) < 2 or sum(sizes[p] for p in parallel) < PARALLEL_MIN_BYTES
+            or threading.active_count() > 1 or 'fork' not in multiprocessing.get_all_start_methods()):
+        for p in paths:
+            yield p, None
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as pool:
+        ahead, pending = iter(parallel), {}
+
+        def fill():
+            while len(pending) < workers * 2:
+                p = next(ahead, None)
+                if p is None:
+                    return
+                pending[p] = pool.submit(_parse_rows, p)
+
+        fill()
+        for p in paths:
+            future = pending.pop(p, None)
+            fill()
+            yield p, (_replay(future) if future else None)
+
+def build_database(file_paths, prune=True, workers=None, **sync_options):
+    """
+    מסנכרן את ה-DB מול קבצי המקור: טוען רק קבצים חדשים או שהשתנו,
+    מוחק שורות של קבצים שהוסרו (אלא אם prune=False) ומדלג על השאר.
+    הפענוח רץ במקביל ב-workers תהליכים (ברירת מחדל IMPORT_WORKERS); הכתיבה סדרתית.
+    sync_options מועברים ל-sync_source_file (גודל מנה, דיווח התקדמות וכו').
+    מחזיר dict עם רשימות loaded / skipped / removed / failed.
+    """
+    stats = {'loaded': [], 'skipped': [], 'removed': [], 'failed': []}
+    with build_lock():
+        conn = get_db_connection()
+        try:
+            if get_schema_version(conn) != SCHEMA_VERSION:
+                conn.close()
+                rebuild_database()
+                conn = get_db_connection()
+
+            _normalize_manifest(conn)
+            manifest = {r['path']: r for r in conn.execute('SELECT * FROM SourceFiles').fetchall()}
+            keys = {source_key(p) for p in file_paths}
+            # טרנזקציה נפרדת לכל קובץ - קובץ אחד לא חוסם ולא מבטל את האחרים
+            for key in sorted(set(manifest) - keys if prune else ()):
+                with conn:
+                    delete_source_rows(conn, key)
+                    conn.execute('DELETE FROM SourceFiles WHERE path=?', (key,))
+                    bump_bank_version(conn)
+                stats['removed'].append(key)
+
+            changed = {}
+            for path in sorted(file_paths):
                 try:
-                    parsed = json.loads(new_data['correct_answer'])
-                    q['correct_answer'] = parsed if isinstance(parsed, list) else new_data['correct_answer']
-                except:
-                    q['correct_answer'] = new_data['correct_answer']
-
-                q['distractor_1'] = new_data['distractor_1']
-                q['distractor_2'] = new_data['distractor_2']
-                q['distractor_3'] = new_data['distractor_3']
-                q['explanation'] = new_data['explanation']
-                q['image'] = new_data['image_path']
-                q['topic'] = new_data['topic']
-                q['sub_topic'] = new_data['sub_topic']
-                found = True
-                break
-        
-        if found:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
-            return True, "עודכן בהצלחה"
-        return False, "השאלה המקורית לא נמצאה"
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    # נתיב שהועבר במפורש ולא קיים (למשל שגיאת הקלדה ב-CLI) הוא כישלון, לא דילוג שקט
+                    print(f"❌ הקובץ לא נמצא: {path}")
+                    stats['failed'].append(path)
+                    continue
+                known = manifest.get(source_key(path))
+                if known and known['mtime'] == st.st_mtime and known['size'] == st.st_size:
+                    stats['skipped'].append(path)
+                    continue
 
-    except Exception as e:
-        return False, str(e)
+                digest = file_hash(path)
+                if known and known['content_hash'] == digest:
+                    # רק ה-mtime השתנה (למשל checkout) - אין צורך לטעון מחדש
+                    with conn:
+                        conn.execute('UPDATE SourceFiles SET mtime=?, size=? WHERE path=?',
+                                     (st.st_mtime, st.st_size, source_key(path)))
+                    stats['skipped'].append(path)
+                    continue
+                changed[path] = (st, digest)
 
-def delete_question_from_file(filename, question_text):
-    if not os.path.exists(filename): return False
-    try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        content_list = data
-        is_wrapper = False
-        if isinstance(data, dict) and 'fullContent' in data:
-            content_list = data['fullContent']
-            is_wrapper = True
-        
-        # סינון (יצירת רשימה חדשה ללא השאלה המדוברת)
-        original_len = len(content_list)
-        new_list = [q for q in content_list if q.get('question_text') != question_text]
-        
-        if len(new_list) == original_len:
-            return False # לא נמצאה שאלה למחיקה
-
-        if is_wrapper:
-            data['fullContent'] = new_list
-        else:
-            data = new_list
-            
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-        return True
-    except Exception as e:
-        print(f"Error deleting: {e}")
-        return False
\ No newline at end of file
+            for path, rows in _parsed_sources(list(changed), IMPORT_WORKERS if workers is None else workers):
+                st, digest = changed[path]
+                with conn:
+                    if sync_source_file(conn, path, rows=rows, **sync_options) is None:
+                        stats['failed'].append(path)
+                        continue
+                    conn.execute('INSERT OR REPLACE INTO SourceFiles (path, mtime, size, content_hash, loaded_at) VALUES (?, ?, ?, ?, ?)',
+                                 (source_key(path), st.st_mtime, st.st_size, digest, time.time()))
+                    bump_bank_version(conn)
+                stats['loaded'].append(path)
+        finally:
+            conn.close()
+    return stats
@@ -0,0 +1,109 @@
+import json
+import time
+import secrets
+
+import data_manager
+import metrics
+
+# מצב ריצה (בחינות פעילות) נשמר בקובץ נפרד - בניית מאגר השאלות מחדש לא נוגעת בו
+STATE_DB_FILE = 'quiz_state.sqlite'
+
+# בחינה שלא נגעו בה יותר מזה נמחקת
+EXAM_TTL_SECONDS = 24 * 60 * 60
+
+def get_state_connection():
+    return data_manager.get_db_connection(db_file=STATE_DB_FILE)
+
+def create_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ExamSessions (
+            exam_id TEXT PRIMARY KEY,
+            sub_topic TEXT,
+            question_ids TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ExamAnswers (
+            exam_id TEXT NOT NULL,
+            question_id INTEGER NOT NULL,
+            answer TEXT NOT NULL,
+            PRIMARY KEY (exam_id, question_id)
+        );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_exam_sessions_updated ON ExamSessions (updated_at);")
+    # עמודה שנוספה אחרי שהטבלה כבר הייתה קיימת בשרתים פעילים
+    columns = {r['name'] for r in conn.execute("PRAGMA table_info(ExamSessions)")}
+    if 'option_orders' not in columns:
+        conn.execute("ALTER TABLE ExamSessions ADD COLUMN option_orders TEXT")
+
+def init_store():
+    conn = get_state_connection()
+    try:
+        with conn:
+            create_tables(conn)
+    finally:
+        conn.close()
+
+def cleanup_expired(conn, ttl=EXAM_TTL_SECONDS):
+    cutoff = time.time() - ttl
+    conn.execute("DELETE FROM ExamAnswers WHERE exam_id IN (SELECT exam_id FROM ExamSessions WHERE updated_at < ?)", (cutoff,))
+    conn.execute("DELETE FROM ExamSessions WHERE updated_at < ?", (cutoff,))
+
+def create_exam(sub_topic, question_ids, option_orders=None):
+    """
+    יוצר בחינה חדשה ומחזיר מזהה אטום שנשמר ב-cookie.
+    option_orders: question_id -> סדר האינדקסים של האפשרויות, קבוע לכל הבחינה.
+    """
+    exam_id = secrets.token_urlsafe(16)
+    now = time.time()
+    orders = json.dumps({str(k): v for k, v in (option_orders or {}).items()})
+    conn = get_state_connection()
+    try:
+        with conn:
+            cleanup_expired(conn)
+            conn.execute("INSERT INTO ExamSessions (exam_id, sub_topic, question_ids, option_orders, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                         (exam_id, sub_topic, json.dumps(question_ids), orders, now, now))
+    finally:
+        conn.close()
+    return exam_id
+
+def get_exam(exam_id):
+    """מחזיר dict עם sub_topic, ids, answers, option_orders - או None אם הבחינה לא קיימת / פגה"""
+    if not exam_id: return None
+    conn = get_state_connection()
+    try:
+        row = conn.execute("SELECT * FROM ExamSessions WHERE exam_id=?", (exam_id,)).fetchone()
+        if not row or row['updated_at'] < time.time() - EXAM_TTL_SECONDS:
+            return None
+        answers = {str(r['question_id']): metrics.json_loads(r['answer'])
+                   for r in conn.execute("SELECT question_id, answer FROM ExamAnswers WHERE exam_id=?", (exam_id,))}
+    finally:
+        conn.close()
+    return {'sub_topic': row['sub_topic'], 'ids': metrics.json_loads(row['question_ids']), 'answers': answers,
+            'option_orders': metrics.json_loads(row['option_orders'] or '{}')}
+
+def save_answer(exam_id, question_id, answer):
+    conn = get_state_connection()
+    try:
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO ExamAnswers (exam_id, question_id, answer) VALUES (?, ?, ?)",
+                         (exam_id, question_id, json.dumps(answer, ensure_ascii=False)))
+            conn.execute("UPDATE ExamSessions SET updated_at=? WHERE exam_id=?", (time.time(), exam_id))
+    finally:
+        conn.close()
+
+def get_seen_question_ids(exam_ids):
+    """כל השאלות שהופיעו בבחינות הקודמות של המשתמש"""
+    if not exam_ids: return set()
+    conn = get_state_connection()
+    try:
+        marks = ','.join('?' * len(exam_ids))
+        rows = conn.execute(f"SELECT question_ids FROM ExamSessions WHERE exam_id IN ({marks})", list(exam_ids)).fetchall()
+    finally:
+        conn.close()
+    seen = set()
+    for r in rows:
+        seen.update(metrics.json_loads(r['question_ids']))
+    return seen
@@ -0,0 +1,61 @@
+"""
+ייבוא מאגרי שאלות גדולים מחוץ לתהליך ה-web.
+
+    python import_questions.py big_bank.ndjson other.json --batch-size 2000 --errors rejected.tsv
+
+הקבצים נקראים בזרימה (NDJSON או מערך JSON) ונכתבים במנות, כל מנה בטרנזקציה משלה,
+כך שהזיכרון לא תלוי בגודל הקובץ. הקובץ נרשם במניפסט וגרסת המאגר עולה, ולכן
+שרת שרץ במקביל רואה את השינוי בבקשה הבאה ולא טוען את הקובץ שוב.
+הקבצים צריכים להישאר בתיקיית המאגר - הם מקור האמת שהשרת מסנכרן מולו. קובץ מזוהה לפי
+שמו בלבד, כך ש-./x.json או נתיב מלא הם אותו קובץ שהשרת מוצא ב-glob (וה-ids נשמרים).
+"""
+import argparse
+import sys
+import time
+
+import data_manager
+
+def main():
+    parser = argparse.ArgumentParser(description="ייבוא מאגרי שאלות בזרימה")
+    parser.add_argument('files', nargs='+', help="קבצי .json / .ndjson / .jsonl")
+    parser.add_argument('--batch-size', type=int, default=data_manager.SYNC_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=data_manager.IMPORT_WORKERS,
+                        help="תהליכי פענוח במקביל (1 = סדרתי)")
+    parser.add_argument('--errors', help="קובץ TSV לרשומות שנדחו (קובץ, מיקום, סיבה)")
+    parser.add_argument('--prune', action='store_true',
+                        help="למחוק מה-DB קבצים שלא הועברו (כמו בעליית השרת)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    errors_out = open(args.errors, 'w', encoding='utf-8') if args.errors else None
+    rejected_total = 0
+
+    def progress(filename, processed, rejected):
+        rate = processed / max(time.perf_counter() - started, 1e-9)
+        print(f"\r⏳ {filename}: {processed:,} רשומות ({rate:,.0f}/s), {rejected:,} נדחו",
+              end='', file=sys.stderr, flush=True)
+
+    def on_error(filename, pos, reason):
+        nonlocal rejected_total
+        rejected_total += 1
+        if errors_out:
+            errors_out.write(f"{filename}\t{pos}\t{reason}\n")
+        elif rejected_total <= data_manager.MAX_REPORTED_ERRORS:
+            print(f"\n   ⚠️ {filename} [{pos}]: {reason}", file=sys.stderr)
+
+    try:
+        stats = data_manager.build_database(args.files, prune=args.prune, workers=args.workers,
+                                            batch_size=args.batch_size,
+                                            progress=progress, on_error=on_error, commit_batches=True)
+    finally:
+        if errors_out:
+            errors_out.close()
+
+    print(file=sys.stderr)
+    print(f"✅ {len(stats['loaded'])} קבצים יובאו, {len(stats['skipped'])} ללא שינוי, "
+          f"{len(stats['removed'])} הוסרו, {len(stats['failed'])} נכשלו; "
+          f"{rejected_total:,} רשומות נדחו ({time.perf_counter() - started:.1f}s).")
+    return 1 if stats['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+מדידה פר-בקשה (opt-in): מספר וזמן שאילתות SQL, זמן רינדור תבניות וזמן פענוח JSON.
+מופעל עם QUIZ_METRICS=1; הסיכומים נחשפים בכותרת Server-Timing וב-/metrics (פורמט Prometheus).
+כשהמדידה כבויה לא נרשם אף hook, ו-json_loads הוא json.loads עצמו.
+המונים הם לכל תהליך (worker) בנפרד.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from flask import Response, g, request, before_render_template, template_rendered
+
+import data_manager
+
+ENABLED = os.environ.get('QUIZ_METRICS', '') == '1'
+
+_lock = threading.Lock()
+_totals = {}  # endpoint -> {requests, seconds, sql_queries, sql_seconds, template_seconds, json_seconds}
+_local = threading.local()
+
+def _current():
+    """המונים של הבקשה הנוכחית (או None מחוץ לבקשה)"""
+    return getattr(_local, 'stats', None)
+
+def _add(key, seconds, count=0):
+    stats = _current()
+    if stats is not None:
+        stats[key] += seconds
+        if count:
+            stats['sql_queries'] += count
+
+# ----------------------------------------------------------------------
+# 🧮 SQL
+# ----------------------------------------------------------------------
+class InstrumentedCursor(sqlite3.Cursor):
+    def execute(self, *args):
+        t = time.perf_counter()
+        try: return super().execute(*args)
+        finally: _add('sql_seconds', time.perf_counter() - t, 1)
+
+    def executemany(self, *args):
+        t = time.perf_counter()
+        try: return super().executemany(*args)
+        finally: _add('sql_seconds', time.perf_counter() - t, 1)
+
+    def fetchone(self):
+        t = time.perf_counter()
+        try: return super().fetchone()
+        finally: _add('sql_seconds', time.perf_counter() - t)
+
+    def fetchall(self):
+        t = time.perf_counter()
+        try: return super().fetchall()
+        finally: _add('sql_seconds', time.perf_counter() - t)
+
+    def fetchmany(self, *args):
+        t = time.perf_counter()
+        try: return super().fetchmany(*args)
+        finally: _add('sql_seconds', time.perf_counter() - t)
+
+    def __next__(self):
+        t = time.perf_counter()
+        try: return super().__next__()
+        finally: _add('sql_seconds', time.perf_counter() - t)
+
+class InstrumentedConnection(data_manager.PooledConnection):
+    # Connection.execute ב-C לא עובר דרך cursor(), לכן עוקפים גם אותו
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+# ----------------------------------------------------------------------
+# 📄 JSON
+# ----------------------------------------------------------------------
+def _timed_json_loads(s, *args, **kwargs):
+    t = time.perf_counter()
+    try: return json.loads(s, *args, **kwargs)
+    finally: _add('json_seconds', time.perf_counter() - t)
+
+json_loads = _timed_json_loads if ENABLED else json.loads
+
+# ----------------------------------------------------------------------
+# 🌐 חיבור לאפליקציה
+# ----------------------------------------------------------------------
+_FIELDS = ('sql_queries', 'sql_seconds', 'template_seconds', 'json_seconds')
+
+def _before_request():
+    _local.stats = dict.fromkeys(_FIELDS, 0)
+    g.metrics_start = time.perf_counter()
+
+def _after_request(response):
+    stats = _current()
+    if stats is None:
+        return response
+    elapsed = time.perf_counter() - g.metrics_start
+    response.headers['Server-Timing'] = (
+        f"db;desc=\"{stats['sql_queries']} queries\";dur={stats['sql_seconds'] * 1000:.2f}, "
+        f"tpl;dur={stats['template_seconds'] * 1000:.2f}, "
+        f"json;dur={stats['json_seconds'] * 1000:.2f}, "
+        f"total;dur={elapsed * 1000:.2f}")
+
+    endpoint = request.endpoint or 'unknown'
+    with _lock:
+        t = _totals.setdefault(endpoint, dict.fromkeys(('requests', 'seconds') + _FIELDS, 0))
+        t['requests'] += 1
+        t['seconds'] += elapsed
+        for key in _FIELDS:
+            t[key] += stats[key]
+    _local.stats = None
+    return response
+
+def _template_started(sender, template, context, **extra):
+    g.metrics_template_start = time.perf_counter()
+
+def _template_done(sender, template, context, **extra):
+    start = g.pop('metrics_template_start', None)
+    if start is not None:
+        _add('template_seconds', time.perf_counter() - start)
+
+_PROMETHEUS = (
+    ('quiz_requests_total', 'requests', 'counter', 'Handled requests'),
+    ('quiz_request_seconds_total', 'seconds', 'counter', 'Wall time spent in requests'),
+    ('quiz_sql_queries_total', 'sql_queries', 'counter', 'SQL statements executed'),
+    ('quiz_sql_seconds_total', 'sql_seconds', 'counter', 'Time spent in SQLite'),
+    ('quiz_template_seconds_total', 'template_seconds', 'counter', 'Time spent rendering templates'),
+    ('quiz_json_parse_seconds_total', 'json_seconds', 'counter', 'Time spent parsing JSON'),
+)
+
+def render_prometheus():
+    with _lock:
+        snapshot = {k: dict(v) for k, v in _totals.items()}
+    lines = []
+    for name, key, kind, help_text in _PROMETHEUS:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for endpoint, t in sorted(snapshot.items()):
+            lines.append(f'{name}{{route="{endpoint}"}} {t[key]}')
+    return "\n".join(lines) + "\n"
+
+def metrics_view():
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+def init_app(app):
+    """מחבר את המדידה לאפליקציה - רק אם QUIZ_METRICS=1"""
+    if not ENABLED:
+        return
+    data_manager.CONNECTION_FACTORY = InstrumentedConnection
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_done, app)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,147 @@
+"""
+סיכומי תוצאות לכל שאלה, מתעדכנים באינקרמנט באותה טרנזקציה שבה יומן הניסיונות כותב מנה.
+כך שאילתות הדשבורד קוראות שורה אחת לשאלה (או לאפשרות) ולא סורקות את כל הניסיונות.
+המפתח הוא ה-uid של השאלה, כך שהסיכומים שורדים בנייה מחדש של המאגר.
+"""
+import json
+from collections import Counter
+
+import exam_store
+from question_store import clean_text_for_comparison
+
+# מתחת למספר הזה של ניסיונות לא מציגים אחוז הצלחה (מדגם קטן מדי)
+MIN_ATTEMPTS = 5
+
+def create_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS QuestionStats (
+            uid TEXT PRIMARY KEY,
+            question_id INTEGER,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            correct INTEGER NOT NULL DEFAULT 0,
+            partial INTEGER NOT NULL DEFAULT 0,
+            wrong INTEGER NOT NULL DEFAULT 0
+        );
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS OptionStats (
+            uid TEXT NOT NULL,
+            option_key TEXT NOT NULL,
+            option_text TEXT NOT NULL,
+            picks INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (uid, option_key)
+        );
+    """)
+
+def init_stats():
+    conn = exam_store.get_state_connection()
+    try:
+        with conn:
+            create_tables(conn)
+            # ניסיונות שנרשמו לפני שהיו סיכומים
+            if not conn.execute("SELECT 1 FROM QuestionStats LIMIT 1").fetchone():
+                rebuild(conn)
+    finally:
+        conn.close()
+
+# ----------------------------------------------------------------------
+# ➕ עדכון אינקרמנטלי
+# ----------------------------------------------------------------------
+QUESTION_UPSERT = """
+    INSERT INTO QuestionStats (uid, question_id, attempts, correct, partial, wrong) VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (uid) DO UPDATE SET
+        question_id = excluded.question_id,
+        attempts = attempts + excluded.attempts,
+        correct = correct + excluded.correct,
+        partial = partial + excluded.partial,
+        wrong = wrong + excluded.wrong
+"""
+
+OPTION_UPSERT = """
+    INSERT INTO OptionStats (uid, option_key, option_text, picks) VALUES (?, ?, ?, ?)
+    ON CONFLICT (uid, option_key) DO UPDATE SET picks = picks + excluded.picks, option_text = excluded.option_text
+"""
+
+def _stat_key(question_id, uid):
+    return uid or f"id:{question_id}"
+
+def apply_attempts(conn, attempts):
+    """attempts: [(question_id, uid, status, selected)] - מצטבר בזיכרון ונכתב כ-upsert אחד לכל שאלה / אפשרות"""
+    questions, options = {}, Counter()
+    texts = {}
+    for question_id, uid, status, selected in attempts:
+        key = _stat_key(question_id, uid)
+        row = questions.setdefault(key, [question_id, 0, 0, 0, 0])
+        row[0] = question_id
+        row[1] += 1
+        row[{'correct': 2, 'partial': 3}.get(status, 4)] += 1
+        for text in selected:
+            option_key = clean_text_for_comparison(text)
+            options[(key, option_key)] += 1
+            texts[(key, option_key)] = text
+    conn.executemany(QUESTION_UPSERT, [(k, *v) for k, v in questions.items()])
+    conn.executemany(OPTION_UPSERT, [(k, ok, texts[(k, ok)], n) for (k, ok), n in options.items()])
+
+def rebuild(conn):
+    """בונה את הסיכומים מחדש מהניסיונות הגולמיים ומהסיכום היומי (לאפשרויות יש רק גולמיים)"""
+    conn.execute("DELETE FROM QuestionStats")
+    conn.execute("DELETE FROM OptionStats")
+    conn.execute("""
+        INSERT INTO QuestionStats (uid, question_id, attempts, correct, partial, wrong)
+        SELECT uid, MAX(question_id), SUM(attempts), SUM(correct), SUM(partial), SUM(wrong)
+        FROM AttemptsDaily GROUP BY uid
+    """)
+    cursor = conn.execute("SELECT question_id, uid, status, selected FROM Attempts")
+    while True:
+        chunk = cursor.fetchmany(5000)
+        if not chunk:
+            break
+        apply_attempts(conn, [(r['question_id'], r['uid'], r['status'], json.loads(r['selected'])) for r in chunk])
+
+# ----------------------------------------------------------------------
+# 📊 קריאה
+# ----------------------------------------------------------------------
+def _percent(correct, attempts):
+    return round(100 * correct / attempts) if attempts >= MIN_ATTEMPTS else None
+
+def get_question_stats(questions):
+    """
+    questions: [(question_id, uid)] -> {question_id: {'attempts', 'percent_correct', 'options'}}
+    options: מפתח אפשרות מנורמל -> (טקסט, מספר בחירות)
+    """
+    keys = {_stat_key(qid, uid): qid for qid, uid in questions}
+    if not keys: return {}
+    result = {}
+    conn = exam_store.get_state_connection()
+    try:
+        key_list = list(keys)
+        for i in range(0, len(key_list), 900):
+            chunk = key_list[i:i+900]
+            marks = ','.join('?' * len(chunk))
+            for r in conn.execute(f"SELECT * FROM QuestionStats WHERE uid IN ({marks})", chunk):
+                result[keys[r['uid']]] = {'attempts': r['attempts'], 'percent_correct': _percent(r['correct'], r['attempts']),
+                                          'options': {}}
+            for r in conn.execute(f"SELECT uid, option_key, option_text, picks FROM OptionStats WHERE uid IN ({marks})", chunk):
+                stats = result.get(keys[r['uid']])
+                if stats is not None:
+                    stats['options'][r['option_key']] = (r['option_text'], r['picks'])
+    finally:
+        conn.close()
+    return result
+
+def top_distractor(stats, compiled):
+    """(טקסט, אחוז מהניסיונות) של המסיח הנפוץ ביותר מבין האפשרויות הנוכחיות של השאלה, או None"""
+    if not stats or stats['percent_correct'] is None: return None
+    distractors = {clean_text_for_comparison(o) for o in compiled.options} - compiled.correct_keys
+    wrong = [(picks, text) for key, (text, picks) in stats['options'].items() if key in distractors]
+    if not wrong: return None
+    picks, text = max(wrong)
+    return text, round(100 * picks / stats['attempts'])
+
+def get_summary():
+    """כל שורות QuestionStats (שורה לשאלה - לא לניסיון), לקיבוץ לפי תת-נושא / קובץ בצד הקורא"""
+    conn = exam_store.get_state_connection()
+    try:
+        return [dict(r) for r in conn.execute("SELECT * FROM QuestionStats")]
+    finally:
+        conn.close()
@@ -0,0 +1,303 @@
+import os
+import re
+import sys
+import html
+import random
+
+import data_manager
+import metrics
+
+# ----------------------------------------------------------------------
+# 🔤 נרמול טקסט
+# ----------------------------------------------------------------------
+_CLEAN_RE = re.compile(r'[^a-z0-9א-ת]')
+
+def clean_text_for_comparison(text):
+    if not text: return ""
+    return _CLEAN_RE.sub('', html.unescape(str(text)).lower())
+
+def parse_correct_answers(raw):
+    """מחזיר (רשימת תשובות נכונות, האם בחירה מרובה)"""
+    try: parsed = metrics.json_loads(raw)
+    except: return [raw], False
+    if isinstance(parsed, list):
+        return parsed, True
+    return [str(parsed)], False
+
+# ----------------------------------------------------------------------
+# 🧩 שאלה מהודרת
+# ----------------------------------------------------------------------
+class CompiledQuestion:
+    """
+    ייצוג מהודר של שורת שאלה: ה-JSON והנרמול מחושבים פעם אחת,
+    וכל הנתיבים (תרגול, בחינה, בדיקה, עריכה) קוראים מכאן.
+    """
+    __slots__ = ('id', 'options', 'correct_answers', 'correct_keys', 'is_multi')
+
+    def __init__(self, row):
+        correct, is_multi = parse_correct_answers(row['correct_answer'])
+        distractors = [row[d] for d in ('distractor_1', 'distractor_2', 'distractor_3') if row[d]]
+        self.id = row['id']
+        self.correct_answers = tuple(correct)
+        self.options = tuple(correct) + tuple(distractors)
+        self.correct_keys = frozenset(clean_text_for_comparison(x) for x in correct)
+        self.is_multi = is_multi
+
+    def shuffled(self, order):
+        """האפשרויות לפי סדר אינדקסים שמור; סדר שלא מתאים (השאלה נערכה באמצע הבחינה) נופל לסדר המקורי"""
+        if order is None or sorted(order) != list(range(len(self.options))):
+            return list(self.options)
+        return [self.options[i] for i in order]
+
+    def grade(self, picks):
+        """מחזיר (status, מספר תשובות נכונות חסרות)"""
+        u_clean = {clean_text_for_comparison(x) for x in picks}
+        hits = len(u_clean & self.correct_keys)
+        if u_clean and u_clean == self.correct_keys:
+            return "correct", 0
+        if hits:
+            return "partial", len(self.correct_keys) - hits
+        return "wrong", len(self.correct_keys)
+
+# ----------------------------------------------------------------------
+# 🧠 מאגר בזיכרון (אופציונלי)
+# ----------------------------------------------------------------------
+# QUIZ_MEMORY_STORE=1: כל השאלות נטענות לזיכרון פעם אחת לכל גרסת מאגר, ונתיבי הקריאה
+# לא ניגשים ל-SQLite מלבד בדיקת הגרסה. עם gunicorn --preload הטעינה קורית בתהליך
+# הראשי לפני ה-fork, והעותק משותף בין ה-workers (copy-on-write, ראו freeze_shared).
+MEMORY_STORE = os.environ.get('QUIZ_MEMORY_STORE', '') == '1'
+
+QUESTION_FIELDS = ('id', 'question_text', 'correct_answer', 'distractor_1', 'distractor_2', 'distractor_3',
+                   'explanation', 'topic', 'sub_topic', 'image_path', 'source_file', 'uid')
+# שדות עם מעט ערכים שונים שחוזרים על עצמם - נשמרים פעם אחת (sys.intern)
+_INTERNED_FIELDS = frozenset(('topic', 'sub_topic', 'image_path', 'source_file'))
+
+class StoredQuestion:
+    """שורת שאלה קומפקטית; נגישה כמו sqlite3.Row (q['topic']) וגם כמאפיין (q.topic)"""
+    __slots__ = QUESTION_FIELDS
+
+    def __init__(self, row):
+        for field in QUESTION_FIELDS:
+            value = row[field]
+            if field in _INTERNED_FIELDS and isinstance(value, str):
+                value = sys.intern(value)
+            setattr(self, field, value)
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def keys(self):
+        return QUESTION_FIELDS
+
+def _load_store(conn):
+    return {r['id']: StoredQuestion(r) for r in conn.execute('SELECT * FROM Questions ORDER BY topic, sub_topic, id')}
+
+def freeze_shared():
+    """
+    נקרא בתהליך הראשי אחרי הטעינה: מוציא את כל האובייקטים הקיימים מה-GC,
+    כך שאיסוף זבל ב-worker לא נוגע בדפי הזיכרון המשותפים ולא מעתיק אותם.
+    """
+    import gc
+    if hasattr(gc, 'freeze'):
+        gc.collect()
+        gc.freeze()
+
+# ----------------------------------------------------------------------
+# 🗂️ מטמון לפי גרסת מאגר
+# ----------------------------------------------------------------------
+# עץ הניווט, מפת המיקומים, השאלות המהודרות וקטעי HTML מרונדרים נבנים פעם אחת לכל גרסת מאגר
+# (נפסלים בעריכה / מחיקה / טעינה מחדש)
+class BankSnapshot:
+    """
+    כל המטמונים של גרסת מאגר אחת. המבנה לא משתנה אחרי הבנייה, והתמונה הנוכחית מוחלפת
+    בהשמה אחת; בקשה עובדת מול התמונה שקיבלה בתחילתה וממזכרת (compiled / fragments) רק לתוכה.
+    כך שורה ישנה שנקראה לפני עריכה לא נשמרת במטמון של הגרסה החדשה.
+    נגיש גם כ-dict (cache['positions']) כמו StoredQuestion.
+    """
+    __slots__ = ('version', 'nav_light', 'positions', 'sub_topic_ids', 'questions', 'compiled', 'fragments')
+
+    def __init__(self, version, nav_light, positions, sub_topic_ids, questions):
+        self.version = version
+        self.nav_light = nav_light
+        self.positions = positions
+        self.sub_topic_ids = sub_topic_ids
+        self.questions = questions
+        self.compiled = {}
+        self.fragments = {}
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+_snapshot = None
+
+def _build_navigation(q_list):
+    """עץ נושא -> תת-נושא -> [{'id', 'number'}]; בלי טקסט השאלה, שלא מוצג בסרגל"""
+    light = {}
+    for q in q_list:
+        subs = light.setdefault(q['topic'], {'sub_topics': {}})['sub_topics']
+        entries = subs.setdefault(q['sub_topic'], [])
+        entries.append({'id': q['id'], 'number': len(entries) + 1})
+    return light
+
+def _build_positions(q_list):
+    """
+    מחזיר (positions, sub_topic_ids):
+    id -> (sub_topic, pos, prev_id, next_id, total), ו-sub_topic -> רשימת ids; הסדר בתוך תת-נושא לפי id
+    """
+    by_sub = {}
+    for q in q_list:
+        by_sub.setdefault(q['sub_topic'], []).append(q['id'])
+
+    positions = {}
+    for sub, ids in by_sub.items():
+        ids.sort()
+        total = len(ids)
+        for i, qid in enumerate(ids):
+            positions[qid] = (sub, i, ids[i-1] if i > 0 else None, ids[i+1] if i+1 < total else None, total)
+    return positions, by_sub
+
+def _build_snapshot(conn):
+    # הגרסה והשורות נקראות באותה טרנזקציית קריאה, כדי שהתמונה לא תערבב שתי גרסאות
+    own_txn = not conn.in_transaction
+    if own_txn:
+        conn.execute('BEGIN')
+    try:
+        version = data_manager.get_bank_version(conn)
+        questions = None
+        if MEMORY_STORE:
+            questions = _load_store(conn)
+            q_list = list(questions.values())
+        else:
+            q_list = conn.execute('SELECT id, topic, sub_topic FROM Questions ORDER BY topic, sub_topic, id').fetchall()
+    finally:
+        if own_txn:
+            conn.rollback()
+    positions, sub_topic_ids = _build_positions(q_list)
+    return BankSnapshot(version, _build_navigation(q_list), positions, sub_topic_ids, questions)
+
+def get_bank_cache(conn):
+    """התמונה של גרסת המאגר הנוכחית; המחזיר צריך להשתמש בה לכל אורך הבקשה"""
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != data_manager.get_bank_version(conn):
+        snapshot = _build_snapshot(conn)
+        # thread שבנה גרסה ישנה יותר (קרא את הגרסה לפני עדכון) לא מחליף תמונה חדשה יותר
+        current = _snapshot
+        if current is None or snapshot.version >= current.version:
+            _snapshot = snapshot
+    return snapshot
+
+def get_compiled(cache, row):
+    compiled = cache['compiled'].get(row['id'])
+    if compiled is None:
+        compiled = cache['compiled'][row['id']] = CompiledQuestion(row)
+    return compiled
+
+def fetch_question(conn, question_id, cache=None):
+    """שאלה אחת לפי id (מהזיכרון אם המאגר בזיכרון פעיל), או None"""
+    questions = (cache or get_bank_cache(conn))['questions'] if MEMORY_STORE else None
+    if questions is not None:
+        return questions.get(question_id)
+    return conn.execute('SELECT * FROM Questions WHERE id=?', (question_id,)).fetchone()
+
+def fetch_questions(conn, ids, cache=None):
+    """שליפת כל השאלות בשאילתה אחת (במנות, בגלל מגבלת הפרמטרים של SQLite)"""
+    questions = (cache or get_bank_cache(conn))['questions'] if MEMORY_STORE else None
+    if questions is not None:
+        return {i: questions[i] for i in ids if i in questions}
+    rows = {}
+    ids = list(ids)
+    for i in range(0, len(ids), 900):
+        chunk = ids[i:i+900]
+        marks = ','.join('?' * len(chunk))
+        for r in conn.execute(f'SELECT * FROM Questions WHERE id IN ({marks})', chunk):
+            rows[r['id']] = r
+    return rows
+
+# ----------------------------------------------------------------------
+# 🎲 דגימת מבחנים
+# ----------------------------------------------------------------------
+def allocate_quotas(count, sizes):
+    """מחלק count שאלות בין תתי-נושאים באופן יחסי לגודלם (שיטת השארית הגדולה), עם תקרה לפי הגודל"""
+    quotas = dict.fromkeys(sizes, 0)
+    remaining = min(count, sum(sizes.values()))
+    open_subs = {s: n for s, n in sizes.items() if n > 0}
+    while remaining > 0 and open_subs:
+        total = sum(open_subs.values())
+        shares = {s: remaining * n / total for s, n in open_subs.items()}
+        given = 0
+        for s in open_subs:
+            take = min(int(shares[s]), sizes[s] - quotas[s])
+            quotas[s] += take
+            given += take
+        # השארית לפי החלק השברי הגדול ביותר
+        for s in sorted(open_subs, key=lambda s: shares[s] - int(shares[s]), reverse=True):
+            if given >= remaining:
+                break
+            if quotas[s] < sizes[s]:
+                quotas[s] += 1
+                given += 1
+        remaining -= given
+        open_subs = {s: n for s, n in open_subs.items() if quotas[s] < sizes[s]}
+        if given == 0:
+            break
+    return quotas
+
+def _sample_ids(ids, k, rng, exclude):
+    """k ids אקראיים מתוך הרשימה בזמן שתלוי ב-k ולא בגודל הרשימה (כל עוד מעט מוחרגים)"""
+    k = min(k, len(ids))
+    if not exclude:
+        return rng.sample(ids, k)
+
+    picked, seen_pos = [], set()
+    attempts = 4 * k + 16
+    while len(picked) < k and attempts:
+        attempts -= 1
+        pos = rng.randrange(len(ids))
+        if pos in seen_pos:
+            continue
+        seen_pos.add(pos)
+        if ids[pos] not in exclude:
+            picked.append(ids[pos])
+    if len(picked) < k:
+        # רוב הרשימה מוחרג - נופלים לסינון מלא
+        taken = set(picked)
+        pool = [i for i in ids if i not in exclude and i not in taken]
+        picked += rng.sample(pool, min(k - len(picked), len(pool)))
+    return picked
+
+def sample_exam(cache, sub_topics, count, quotas, rng, exclude=frozenset()):
+    """
+    מבחן אקראי על פני כמה תתי-נושאים: quotas קובע כמה שאלות מכל תת-נושא,
+    ושאר ה-count מתחלק יחסית בין תתי-הנושאים בלי מכסה מפורשת.
+    הדגימה משתמשת באינדקס ה-ids לכל תת-נושא ולכן עולה O(N) ולא O(גודל המאגר).
+    """
+    index = cache['sub_topic_ids']
+    subs = [s for s in sub_topics if s in index]
+    # מכסה לא יכולה לעבור את גודל תת-הנושא, אחרת שאר ה-count מחושב ממכסה שלא תתמלא
+    fixed = {s: min(quotas[s], len(index[s])) for s in subs if quotas.get(s, 0) > 0}
+    if sum(fixed.values()) > count:
+        # מכסות שעוברות את אורך המבחן מוקטנות יחסית - המבחן לא ארוך מ-count
+        fixed = {s: n for s, n in allocate_quotas(count, fixed).items() if n}
+    auto = {s: len(index[s]) for s in subs if s not in fixed}
+    plan = dict(fixed)
+    plan.update(allocate_quotas(max(count - sum(fixed.values()), 0), auto))
+
+    picked = []
+    for s in subs:
+        if plan.get(s):
+            picked += _sample_ids(index[s], plan[s], rng, exclude)
+    rng.shuffle(picked)
+    return picked
+
+def option_orders(cache, rows, seed):
+    """
+    סדר אפשרויות דטרמיניסטי לכל שאלה בבחינה, מחושב פעם אחת בתחילתה:
+    אותו seed ואותה שאלה תמיד נותנים את אותו ערבוב.
+    """
+    orders = {}
+    for qid, row in rows.items():
+        order = list(range(len(get_compiled(cache, row).options)))
+        random.Random(f"{seed}:{qid}").shuffle(order)
+        orders[qid] = order
+    return orders